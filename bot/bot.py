@@ -6,6 +6,8 @@ Entry point for the Telegram bot that delivers daily content from Yandex Disk
 
 import telebot
 import configparser
+import queue
+from datetime import date as dt_date, time as dt_time
 from pathlib import Path
 from typing import Dict, Optional
 
@@ -31,13 +33,19 @@ except ImportError:
     from present_navigator import PresentNavigator
     from operation_logger import setup_logger
 
-from disk_api_handler.disk_handler import YandexDiskHandler
+from disk_api_handler.disk_handler import get_shared_handler
 
 
 class DailyContentBot:
     """Main bot class for daily content delivery."""
     
-    def __init__(self, bot_token_path: str = "bot_token.txt", bot_token: Optional[str] = None, disk_token: Optional[str] = None):
+    def __init__(
+        self,
+        bot_token_path: str = "bot_token.txt",
+        bot_token: Optional[str] = None,
+        disk_token: Optional[str] = None,
+        error_queue: Optional[queue.Queue] = None
+    ):
         """
         Initialize the bot.
         
@@ -47,6 +55,8 @@ class DailyContentBot:
                       instead of reading from file.
             disk_token: Optional Yandex Disk token string. If provided, uses this token directly
                        instead of reading from file.
+            error_queue: Optional queue receiving delivery errors as they happen
+                        (see ContentScheduler), so a UI never has to poll the scheduler.
         """
         # Load bot token
         if bot_token is not None:
@@ -89,9 +99,9 @@ class DailyContentBot:
         # Initialize modules
         self.user_manager = UserManager()
         if disk_token is not None:
-            self.disk_handler = YandexDiskHandler(token=disk_token)
+            self.disk_handler = get_shared_handler(token=disk_token)
         else:
-            self.disk_handler = YandexDiskHandler()
+            self.disk_handler = get_shared_handler()
         self.day_calculator = DayCalculator()
         self.content_fetcher = ContentFetcher(self.disk_handler)
         self.content_sender = ContentSender(
@@ -114,14 +124,14 @@ class DailyContentBot:
         self.present_navigation_paths: Dict[int, list] = {}  # chat_id -> [path1, path2, ...]
         
         # Initialize scheduler (default: 9:00 AM, configurable)
-        from datetime import time as dt_time
         self.scheduler = ContentScheduler(
             self.bot,
             self.user_manager,
             self.disk_handler,
             delivery_time=dt_time(9, 0),  # 9:00 AM default, can be changed via set_delivery_time()
             file_id_cache=self.file_id_cache,
-            cache_chat_id=cache_chat_id
+            cache_chat_id=cache_chat_id,
+            error_queue=error_queue
         )
         
         # Register handlers
@@ -137,14 +147,13 @@ class DailyContentBot:
             page: Page number (0-indexed) for pagination
         """
         try:
-            # Get program data
-            program_data = self.user_manager.get_program_data(username)
-            if not program_data:
+            # Get program
+            program_key = self.user_manager.find_user_program(username)
+            if not program_key:
                 self.bot.send_message(chat_id, "❌ Ошибка: программа не найдена", parse_mode="HTML")
                 return
             
-            program_key = self.user_manager.find_user_program(username)
-            begin_date = program_data.get('begin_date')
+            begin_date = self.user_manager.get_begin_date(username)
             
             if not begin_date:
                 self.bot.send_message(chat_id, "❌ Ошибка: дата начала не найдена", parse_mode="HTML")
@@ -156,7 +165,6 @@ class DailyContentBot:
                 self.bot.send_message(chat_id, "❌ Ошибка: неверная дата начала", parse_mode="HTML")
                 return
             
-            from datetime import date as dt_date
             current_date = dt_date.today()
             current_day = (current_date - begin_date_obj).days + 1
             if current_day < 1:
@@ -277,13 +285,12 @@ class DailyContentBot:
             True if successful, False otherwise
         """
         try:
-            # Get program data
-            program_data = self.user_manager.get_program_data(username)
-            if not program_data:
+            # Get program
+            program_key = self.user_manager.find_user_program(username)
+            if not program_key:
                 return False
             
-            program_key = self.user_manager.find_user_program(username)
-            begin_date = program_data.get('begin_date')
+            begin_date = self.user_manager.get_begin_date(username)
             
             if not begin_date:
                 return False
@@ -844,15 +851,14 @@ class DailyContentBot:
             message: Optional message object for replying
         """
         try:
-            # Get program data
-            program_data = self.user_manager.get_program_data(username)
-            if not program_data:
+            # Get program
+            program_key = self.user_manager.find_user_program(username)
+            if not program_key:
                 if message:
                     self.bot.reply_to(message, "❌ Ошибка: программа не найдена")
                 return
             
-            program_key = self.user_manager.find_user_program(username)
-            begin_date = program_data.get('begin_date')
+            begin_date = self.user_manager.get_begin_date(username)
             
             if not begin_date:
                 if message:
@@ -1006,6 +1012,10 @@ class DailyContentBot:
             self.scheduler.stop()
             self.logger.info("Scheduler stopped")
         
+        # Write out any handler_list changes still waiting for the save timer
+        if hasattr(self, 'user_manager') and self.user_manager:
+            self.user_manager.flush()
+        
         # Stop bot polling
         if hasattr(self, 'bot') and self.bot:
             try:
@@ -1019,6 +1029,10 @@ class DailyContentBot:
                 error_msg = f"Warning: Could not stop bot gracefully: {str(e)}"
                 print(error_msg)
                 self.logger.warning(error_msg)
+        
+        # Close the file_id database once nothing sends through it anymore
+        if hasattr(self, 'file_id_cache') and self.file_id_cache:
+            self.file_id_cache.close()
     
     def _get_cache_chat_id(self) -> Optional[int]:
         """
@@ -1085,9 +1099,8 @@ class DailyContentBot:
         # Save chat_id to handler_list.Json
         self.user_manager.set_user_chat_id(username, chat_id)
         
-        # Update scheduler's map if it has one
-        if hasattr(self.scheduler, 'user_chat_map'):
-            self.scheduler.user_chat_map[username] = chat_id
+        # Update scheduler's map (always present, empty until the scheduler starts)
+        self.scheduler.user_chat_map[username] = chat_id
 
 
 def main():
@@ -5,10 +5,16 @@ Retrieves content from Yandex Disk folders
 """
 
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
 from disk_api_handler.disk_handler import YandexDiskHandler, FileNotFoundError, APIError
 import re
 
+# Handle both package and direct execution
+try:
+    from .day_calculator import DayCalculator
+except ImportError:
+    from day_calculator import DayCalculator
+
 
 class ContentFetcher:
     """Fetches content from Yandex Disk day folders."""
@@ -139,31 +145,22 @@ class ContentFetcher:
                 except (APIError, FileNotFoundError) as e:
                     result['error'] = f"Failed to read text file: {str(e)}"
             
-            # Download media files (images, videos, audio)
-            for media_path in media_files:
-                try:
-                    local_path = self.disk_handler.download_file(media_path)
-                    result['media_files'].append(local_path)
-                except (APIError, FileNotFoundError) as e:
-                    # Log error but continue with other files
-                    error_msg = f"Some media files failed to download: {str(e)}"
-                    if not result['error']:
-                        result['error'] = error_msg
-                    else:
-                        result['error'] += f"; {error_msg}"
-            
-            # Download document files (.doc, .docx, .pdf)
-            for doc_path in document_files:
-                try:
-                    local_path = self.disk_handler.download_file(doc_path)
-                    result['document_files'].append(local_path)
-                except (APIError, FileNotFoundError) as e:
-                    # Log error but continue with other files
-                    error_msg = f"Some document files failed to download: {str(e)}"
-                    if not result['error']:
-                        result['error'] = error_msg
-                    else:
-                        result['error'] += f"; {error_msg}"
+            # Download media files (images, videos, audio) and documents (.doc, .docx, .pdf)
+            # in one concurrent batch
+            downloads = self.disk_handler.download_files(media_files + document_files)
+            for index, outcome in enumerate(downloads):
+                is_media = index < len(media_files)
+                if not isinstance(outcome, Exception):
+                    result['media_files' if is_media else 'document_files'].append(outcome)
+                    continue
+                
+                # Log error but continue with other files
+                kind = "media" if is_media else "document"
+                error_msg = f"Some {kind} files failed to download: {str(outcome)}"
+                if not result['error']:
+                    result['error'] = error_msg
+                else:
+                    result['error'] += f"; {error_msg}"
             
         except FileNotFoundError:
             result['error'] = "Day folder not found"
@@ -174,7 +171,48 @@ class ContentFetcher:
         
         return result
     
-    def get_available_days(self, program_key: str, max_day: int) -> List[int]:
+    def fetch_days_content(self, program_key: str, day_numbers: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Fetch content for several days of one program.
+        
+        The program folder is listed once to find which day folders exist; missing days get
+        the "Day folder not found" error without a request of their own.
+        
+        Args:
+            program_key: Program key (e.g., "program_1")
+            day_numbers: Day numbers to fetch (e.g., [1, 2, 3])
+        
+        Returns:
+            Dictionary mapping day number to the same structure fetch_day_content returns
+        """
+        program_path = DayCalculator.get_program_base_path(program_key)
+        day_numbers = list(day_numbers)
+        
+        try:
+            items = self.disk_handler.list_directory(program_path)
+            existing = {item.get('name') for item in items if item.get('type') == 'dir'}
+        except FileNotFoundError:
+            existing = set()
+        except Exception:
+            # Listing failed for another reason; let each day report its own error
+            existing = None
+        
+        results = {}
+        for day_number in day_numbers:
+            day_folder = f"{day_number}_day"
+            if existing is not None and day_folder not in existing:
+                results[day_number] = {
+                    'text_content': None,
+                    'media_files': [],
+                    'document_files': [],
+                    'error': "Day folder not found"
+                }
+            else:
+                results[day_number] = self.fetch_day_content(f"{program_path}/{day_folder}")
+        
+        return results
+    
+    def get_available_days(self, program_key: str, max_day: int, raise_errors: bool = False) -> List[int]:
         """
         Check Yandex Disk for existing day folders.
         Returns list of day numbers that have corresponding folders.
@@ -185,12 +223,17 @@ class ContentFetcher:
             program_key: Program key (e.g., "program_1")
             max_day: Maximum day number to check (based on begin_date and current date)
                    Note: This parameter is kept for backward compatibility but not used in the optimized version
+            raise_errors: If True, API/network errors are raised instead of being reported
+                          as an empty list, so callers can tell them from a program without days
         
         Returns:
             List of day numbers that have corresponding folders (e.g., [1, 2, 3, 5, 7])
+        
+        Raises:
+            Exception: Only with raise_errors, for errors other than a missing program folder.
         """
         available = []
-        program_path = f"disk:/{program_key}"
+        program_path = DayCalculator.get_program_base_path(program_key)
         
         try:
             # List the program directory once - much faster than checking each day folder
@@ -218,6 +261,8 @@ class ContentFetcher:
             # Program directory doesn't exist
             return []
         except Exception as e:
+            if raise_errors:
+                raise
             # Other errors (API errors, etc.), return empty list
             # Log the error for debugging (use print since logger might not be available)
             import traceback
@@ -479,11 +479,8 @@ class ContentSender:
                 )
                 self.logger.debug(f"Published temporary link for {file_name} (expires in 30 seconds)")
                 
-                # Get public URL from result
+                # Get public URL from result (the handler already retried the lookup)
                 public_url = result.get('public_url')
-                if not public_url:
-                    # Fallback: try to get public URL directly
-                    public_url = self.disk_handler._get_public_url(file_path)
                 
                 if public_url:
                     links_message += f"🔗 {file_name}\n{public_url}\n\n"
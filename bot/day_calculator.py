@@ -5,23 +5,25 @@ Calculates which day folder to access based on begin_date
 """
 
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Optional, List, Union
 
 
 class DayCalculator:
     """Calculates day folder name based on begin_date."""
     
     @staticmethod
-    def parse_begin_date(date_str: str) -> Optional[date]:
+    def parse_begin_date(date_str: Union[str, date]) -> Optional[date]:
         """
         Parse begin_date string to date object.
         
         Args:
-            date_str: Date string in format "YYYY-MM-DD"
+            date_str: Date string in format "YYYY-MM-DD", or an already parsed date
         
         Returns:
             date object if valid, None otherwise
         """
+        if isinstance(date_str, date):
+            return date_str
         try:
             return datetime.strptime(date_str, "%Y-%m-%d").date()
         except (ValueError, TypeError):
@@ -50,8 +52,8 @@ class DayCalculator:
         if current_date is None:
             current_date = date.today()
         
-        # Calculate days difference (inclusive: day 1 = begin_date)
-        days_diff = (current_date - begin_date).days + 1
+        # Calculate days difference via ordinals (inclusive: day 1 = begin_date), avoids a timedelta
+        days_diff = current_date.toordinal() - begin_date.toordinal() + 1
         
         # Handle edge cases
         if days_diff < 1:
@@ -60,6 +62,19 @@ class DayCalculator:
         
         return f"{days_diff}_day"
     
+    @staticmethod
+    def get_program_base_path(program_key: str) -> str:
+        """
+        Get path to a program's root folder on Yandex Disk.
+        
+        Args:
+            program_key: Program key (e.g., "program_1")
+        
+        Returns:
+            Path like "disk:/program_1"
+        """
+        return f"disk:/{program_key}"
+    
     @staticmethod
     def get_program_folder_path(program_key: str, day_folder: str) -> str:
         """
@@ -72,11 +87,11 @@ class DayCalculator:
         Returns:
             Full path like "disk:/program_1/1_day"
         """
-        return f"disk:/{program_key}/{day_folder}"
+        return f"{DayCalculator.get_program_base_path(program_key)}/{day_folder}"
     
     @staticmethod
     def calculate_days_to_deliver(
-        begin_date_str: str,
+        begin_date_str: Union[str, date],
         last_message_date: Optional[int],
         current_date: Optional[date] = None
     ) -> List[int]:
@@ -84,7 +99,7 @@ class DayCalculator:
         Calculate which day numbers should be delivered based on last_message_date.
         
         Args:
-            begin_date_str: Begin date string in format "YYYY-MM-DD"
+            begin_date_str: Begin date string in format "YYYY-MM-DD", or a parsed date
             last_message_date: Unix timestamp of last message date, or None if never delivered
             current_date: Current date (defaults to today)
         
@@ -99,7 +114,7 @@ class DayCalculator:
             current_date = date.today()
         
         # Calculate current day number
-        current_day = (current_date - begin_date).days + 1
+        current_day = current_date.toordinal() - begin_date.toordinal() + 1
         if current_day < 1:
             return []  # Program hasn't started yet
         
@@ -115,7 +130,7 @@ class DayCalculator:
             return list(range(1, current_day + 1))
         
         # Calculate last delivered day number
-        last_day = (last_date - begin_date).days + 1
+        last_day = last_date.toordinal() - begin_date.toordinal() + 1
         
         # If last_day is invalid or in the future, deliver all days
         if last_day < 1 or last_day > current_day:
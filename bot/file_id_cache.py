@@ -6,6 +6,7 @@ Manages caching of Telegram file_ids to avoid re-uploading the same files.
 
 import json
 import hashlib
+import sqlite3
 from pathlib import Path
 from typing import Optional, Dict
 import threading
@@ -14,19 +15,51 @@ import threading
 class FileIdCache:
     """Manages file_id cache for Telegram files."""
     
-    def __init__(self, cache_file: str = "file_id_cache.json"):
+    LOCK_STRIPES = 16  # Number of stripe locks (must be a power of two)
+    
+    def __init__(self, cache_file: str = "file_id_cache.db"):
         """
         Initialize FileIdCache.
         
         Args:
-            cache_file: Path to JSON file for persisting cache
+            cache_file: Path to SQLite database for persisting cache.
+                       A legacy JSON cache with the same stem is imported on first load.
         """
-        self.cache_file = Path(cache_file)
-        self.cache: Dict[str, str] = {}  # file_key -> file_id
-        self.lock = threading.Lock()  # Thread-safe access
+        cache_path = Path(cache_file)
+        if cache_path.suffix.lower() == '.json':
+            cache_path = cache_path.with_suffix('.db')
+        self.cache_file = cache_path
+        self.legacy_cache_file = cache_path.with_suffix('.json')
+        self.cache: Dict[str, str] = {}  # file_key -> file_id (in-memory mirror of the database)
+        # Striped locks: operations on different keys don't serialize on one mutex
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._db_lock = threading.Lock()  # Serializes use of the SQLite connection
+        self._conn: Optional[sqlite3.Connection] = None
         
-        # Load existing cache
-        self._load_cache()
+        # Existing cache is loaded lazily on first access
+        self._loaded = False
+        self._load_lock = threading.Lock()
+    
+    def _ensure_loaded(self) -> None:
+        """Load cache from disk on first access."""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self._load_cache()
+                self._loaded = True
+    
+    def _stripe(self, file_key: str) -> threading.Lock:
+        """
+        Get the stripe lock guarding a cache key.
+        
+        Args:
+            file_key: Cache key
+        
+        Returns:
+            Lock for the key's stripe
+        """
+        return self._locks[hash(file_key) & (self.LOCK_STRIPES - 1)]
     
     def _get_file_key(self, file_path: str) -> str:
         """
@@ -60,25 +93,60 @@ class FileIdCache:
             return f"path:{file_path}"
     
     def _load_cache(self) -> None:
-        """Load cache from JSON file."""
-        if self.cache_file.exists():
-            try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    self.cache = json.load(f)
-                print(f"Loaded {len(self.cache)} file_ids from cache")
-            except Exception as e:
-                print(f"Error loading cache file: {e}")
-                self.cache = {}
-        else:
+        """Open the SQLite cache, import a legacy JSON cache if needed, and fill the in-memory mirror."""
+        try:
+            is_new_database = not self.cache_file.exists()
+            self._conn = sqlite3.connect(str(self.cache_file), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_ids (file_key TEXT PRIMARY KEY, file_id TEXT NOT NULL)"
+            )
+            self._conn.commit()
+            
+            self.cache = dict(self._conn.execute("SELECT file_key, file_id FROM file_ids"))
+            
+            if is_new_database and self.legacy_cache_file.exists():
+                self._import_legacy_cache()
+            
+            print(f"Loaded {len(self.cache)} file_ids from cache")
+        except Exception as e:
+            print(f"Error loading cache file: {e}")
             self.cache = {}
     
-    def _save_cache(self) -> None:
-        """Save cache to JSON file."""
+    def _import_legacy_cache(self) -> None:
+        """Import entries from the old JSON cache file into the database."""
         try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f, indent=2, ensure_ascii=False)
+            data = self.legacy_cache_file.read_bytes()
+            legacy = json.loads(data) if data.strip() else {}
         except Exception as e:
-            print(f"Error saving cache file: {e}")
+            print(f"Error reading legacy cache file {self.legacy_cache_file}: {e}")
+            return
+        
+        if not legacy:
+            return
+        
+        self._conn.executemany("INSERT OR REPLACE INTO file_ids VALUES (?, ?)", legacy.items())
+        self._conn.commit()
+        self.cache = dict(legacy)
+        print(f"Imported {len(legacy)} file_ids from {self.legacy_cache_file}")
+    
+    def _execute(self, sql: str, params: tuple = ()) -> None:
+        """
+        Execute a single write statement against the cache database.
+        
+        Args:
+            sql: SQL statement
+            params: Statement parameters
+        """
+        if self._conn is None:
+            return
+        with self._db_lock:
+            try:
+                self._conn.execute(sql, params)
+                self._conn.commit()
+            except Exception as e:
+                print(f"Error saving cache file: {e}")
     
     def get_file_id(self, file_path: str) -> Optional[str]:
         """
@@ -90,8 +158,9 @@ class FileIdCache:
         Returns:
             file_id if found in cache, None otherwise
         """
-        with self.lock:
-            file_key = self._get_file_key(file_path)
+        self._ensure_loaded()
+        file_key = self._get_file_key(file_path)
+        with self._stripe(file_key):
             return self.cache.get(file_key)
     
     def set_file_id(self, file_path: str, file_id: str) -> None:
@@ -102,10 +171,11 @@ class FileIdCache:
             file_path: Path to the file
             file_id: Telegram file_id
         """
-        with self.lock:
-            file_key = self._get_file_key(file_path)
+        self._ensure_loaded()
+        file_key = self._get_file_key(file_path)
+        with self._stripe(file_key):
             self.cache[file_key] = file_id
-            self._save_cache()
+            self._execute("INSERT OR REPLACE INTO file_ids VALUES (?, ?)", (file_key, file_id))
     
     def remove_file_id(self, file_path: str) -> None:
         """
@@ -114,17 +184,23 @@ class FileIdCache:
         Args:
             file_path: Path to the file
         """
-        with self.lock:
-            file_key = self._get_file_key(file_path)
-            if file_key in self.cache:
-                del self.cache[file_key]
-                self._save_cache()
+        self._ensure_loaded()
+        file_key = self._get_file_key(file_path)
+        with self._stripe(file_key):
+            if self.cache.pop(file_key, None) is not None:
+                self._execute("DELETE FROM file_ids WHERE file_key = ?", (file_key,))
     
     def clear_cache(self) -> None:
         """Clear all cached entries."""
-        with self.lock:
+        self._ensure_loaded()
+        for lock in self._locks:
+            lock.acquire()
+        try:
             self.cache.clear()
-            self._save_cache()
+            self._execute("DELETE FROM file_ids")
+        finally:
+            for lock in self._locks:
+                lock.release()
     
     def get_cache_size(self) -> int:
         """
@@ -133,9 +209,12 @@ class FileIdCache:
         Returns:
             Number of cached file_ids
         """
-        with self.lock:
-            return len(self.cache)
-
-
-
-
+        self._ensure_loaded()
+        return len(self.cache)
+    
+    def close(self) -> None:
+        """Close the cache database connection."""
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -5,7 +5,8 @@ Builds inline keyboards for day selection with pagination support.
 """
 
 import math
-from typing import List, Optional
+from functools import lru_cache
+from typing import List, Optional, Tuple
 import telebot.types as types
 
 
@@ -14,6 +15,20 @@ class KeyboardBuilder:
     
     DAYS_PER_PAGE = 12  # Number of day buttons per page
     
+    @staticmethod
+    def _day_button(day_num: int, callback_prefix: str) -> types.InlineKeyboardButton:
+        """
+        Build a single day selection button.
+        
+        Args:
+            day_num: Day number
+            callback_prefix: Prefix for callback data
+        
+        Returns:
+            InlineKeyboardButton for the day
+        """
+        return types.InlineKeyboardButton(f"День {day_num}", callback_data=f"{callback_prefix}{day_num}")
+    
     @staticmethod
     def build_day_selection_keyboard(
         available_days: List[int],
@@ -28,6 +43,27 @@ class KeyboardBuilder:
             current_page: Current page number (0-indexed)
             callback_prefix: Prefix for callback data (default: "day_")
         
+        Returns:
+            InlineKeyboardMarkup with day buttons and navigation
+        """
+        # Many users share the same day list, so identical keyboards are built once and reused
+        return KeyboardBuilder._build_day_selection_cached(tuple(available_days), current_page, callback_prefix)
+    
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _build_day_selection_cached(
+        available_days: Tuple[int, ...],
+        current_page: int,
+        callback_prefix: str
+    ) -> types.InlineKeyboardMarkup:
+        """
+        Build day selection keyboard (memoized, markup must not be mutated by callers).
+        
+        Args:
+            available_days: Tuple of available day numbers
+            current_page: Current page number (0-indexed)
+            callback_prefix: Prefix for callback data
+        
         Returns:
             InlineKeyboardMarkup with day buttons and navigation
         """
@@ -45,19 +81,12 @@ class KeyboardBuilder:
         end_idx = start_idx + KeyboardBuilder.DAYS_PER_PAGE
         page_days = available_days[start_idx:end_idx]
         
-        # Build keyboard rows
-        keyboard = []
-        
-        # Add day buttons (3 buttons per row for better layout)
+        # Build keyboard rows of day buttons (3 buttons per row for better layout)
         buttons_per_row = 3
-        for i in range(0, len(page_days), buttons_per_row):
-            row = page_days[i:i + buttons_per_row]
-            keyboard_row = []
-            for day_num in row:
-                button_text = f"День {day_num}"
-                callback_data = f"{callback_prefix}{day_num}"
-                keyboard_row.append(types.InlineKeyboardButton(button_text, callback_data=callback_data))
-            keyboard.append(keyboard_row)
+        keyboard = [
+            [KeyboardBuilder._day_button(day_num, callback_prefix) for day_num in page_days[i:i + buttons_per_row]]
+            for i in range(0, len(page_days), buttons_per_row)
+        ]
         
         # Add navigation row
         nav_row = []
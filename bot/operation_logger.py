@@ -2,14 +2,27 @@
 Operation Logger
 
 Provides file-based logging with automatic rotation at 10MB maximum size.
+File I/O happens on a background QueueListener thread so logging callers never block on disk.
 """
 
+import atexit
 import logging
 import logging.handlers
+import queue
 from pathlib import Path
 from typing import Optional
 
 
+def _stop_listener(logger: logging.Logger) -> None:
+    """Stop the logger's QueueListener (if any), flushing pending records to the file."""
+    listener = getattr(logger, 'queue_listener', None)
+    if listener is not None:
+        logger.queue_listener = None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
 def setup_logger(log_file: Optional[str] = None) -> logging.Logger:
     """
     Setup and configure the operation logger.
@@ -31,7 +44,8 @@ def setup_logger(log_file: Optional[str] = None) -> logging.Logger:
     logger = logging.getLogger('bot_operations')
     logger.setLevel(logging.DEBUG)
     
-    # Remove existing handlers to avoid duplicates
+    # Remove existing handlers to avoid duplicates (and flush the previous listener)
+    _stop_listener(logger)
     logger.handlers.clear()
     
     # Create rotating file handler with 10MB max size
@@ -51,12 +65,29 @@ def setup_logger(log_file: Optional[str] = None) -> logging.Logger:
     )
     file_handler.setFormatter(formatter)
     
+    # Callers only enqueue records; the listener thread owns the file handler
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    
+    # Stash listener so it can be stopped on shutdown
+    logger.queue_listener = listener
+    
     # Add handler to logger
-    logger.addHandler(file_handler)
+    logger.addHandler(queue_handler)
     
     return logger
 
 
+def shutdown_logger() -> None:
+    """Stop the background log listener, flushing any queued records to disk."""
+    _stop_listener(logging.getLogger('bot_operations'))
+
+
+atexit.register(shutdown_logger)
+
+
 def get_logger() -> logging.Logger:
     """
     Get the operation logger instance.
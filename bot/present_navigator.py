@@ -4,14 +4,51 @@ Present Navigator Module
 Handles reading and navigating the present folder structure on Yandex Disk.
 """
 
-from typing import List, Optional
+import posixpath
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from disk_api_handler.disk_handler import YandexDiskHandler, APIError, FileNotFoundError
 
 
+# Cache TTL in seconds for folder listings and msg.txt contents
+CACHE_TTL = 30
+
+# full_path -> (monotonic timestamp, value)
+_LIST_CACHE: Dict[str, Tuple[float, List[str]]] = {}
+_MSG_CACHE: Dict[str, Tuple[float, str]] = {}
+
+
+def _cache_get(cache: Dict[str, Tuple[float, Any]], key: str) -> Optional[Any]:
+    """Return cached value if present and not expired, None otherwise."""
+    entry = cache.get(key)
+    if entry is not None and time.monotonic() - entry[0] < CACHE_TTL:
+        return entry[1]
+    return None
+
+
 class PresentNavigator:
     """Handles navigation through the present folder structure on Yandex Disk."""
     
     BASE_PATH = "/present"
+    _BASE_PREFIX = BASE_PATH + "/"
+    
+    @classmethod
+    def invalidate(cls, path: Optional[str] = None) -> None:
+        """
+        Drop cached listings and messages.
+        
+        Args:
+            path: Relative path within present folder to invalidate.
+                  If None, the whole cache is cleared.
+        """
+        if path is None:
+            _LIST_CACHE.clear()
+            _MSG_CACHE.clear()
+            return
+        
+        full_path = cls._get_full_path(path)
+        _LIST_CACHE.pop(full_path, None)
+        _MSG_CACHE.pop(full_path, None)
     
     @staticmethod
     def validate_folder_path(path: str) -> bool:
@@ -24,18 +61,11 @@ class PresentNavigator:
         Returns:
             True if path is valid and within /present directory, False otherwise
         """
-        if not path:
-            return True  # Empty path means root of present folder
-        
-        # Normalize path
-        normalized = path.strip().strip('/')
-        
-        # Check if path tries to escape the present directory
-        if normalized.startswith('..') or '/../' in normalized:
+        try:
+            PresentNavigator._get_full_path(path)
+            return True
+        except ValueError:
             return False
-        
-        # Path should be relative to present folder
-        return True
     
     @staticmethod
     def _get_full_path(relative_path: str = "") -> str:
@@ -47,15 +77,21 @@ class PresentNavigator:
             
         Returns:
             Full path string (e.g., "/present" or "/present/option1")
+        
+        Raises:
+            ValueError: If the path escapes the present directory (e.g., via "..")
         """
         if not relative_path or relative_path == "/":
             return PresentNavigator.BASE_PATH
         
-        # Remove leading/trailing slashes
-        relative_path = relative_path.strip().strip('/')
+        full_path = posixpath.normpath(
+            posixpath.join(PresentNavigator.BASE_PATH, relative_path.strip().lstrip('/'))
+        )
+        
+        if full_path != PresentNavigator.BASE_PATH and not full_path.startswith(PresentNavigator._BASE_PREFIX):
+            raise ValueError(f"Path escapes present directory: {relative_path}")
         
-        # Combine base path with relative path
-        return f"{PresentNavigator.BASE_PATH}/{relative_path}"
+        return full_path
     
     @staticmethod
     def get_folder_message(disk_handler: YandexDiskHandler, folder_path: str = "") -> str:
@@ -71,23 +107,33 @@ class PresentNavigator:
         """
         try:
             full_path = PresentNavigator._get_full_path(folder_path)
-            msg_file_path = f"{full_path}/msg.txt"
-            
+        except ValueError:
+            return ""
+        
+        cached = _cache_get(_MSG_CACHE, full_path)
+        if cached is not None:
+            return cached
+        
+        msg_file_path = f"{full_path}/msg.txt"
+        try:
             print(f"DEBUG: Attempting to read msg.txt from: {msg_file_path}")
             content = disk_handler.get_text_file_content(msg_file_path)
             print(f"DEBUG: Successfully read msg.txt, content length: {len(content) if content else 0}")
-            return content.strip() if content else ""
+            message = content.strip() if content else ""
+            _MSG_CACHE[full_path] = (time.monotonic(), message)
+            return message
         except FileNotFoundError as e:
-            # msg.txt doesn't exist, return empty string
-            print(f"DEBUG: msg.txt not found at {PresentNavigator._get_full_path(folder_path)}/msg.txt: {e}")
+            # msg.txt doesn't exist, return empty string (cached - missing file is a stable answer)
+            print(f"DEBUG: msg.txt not found at {msg_file_path}: {e}")
+            _MSG_CACHE[full_path] = (time.monotonic(), "")
             return ""
         except APIError as e:
             # API error, log and return empty string
-            print(f"DEBUG: API error reading msg.txt from {PresentNavigator._get_full_path(folder_path)}/msg.txt: {e}")
+            print(f"DEBUG: API error reading msg.txt from {msg_file_path}: {e}")
             return ""
         except Exception as e:
             # Any other error, log and return empty string
-            print(f"DEBUG: Unexpected error reading msg.txt from {PresentNavigator._get_full_path(folder_path)}/msg.txt: {type(e).__name__}: {e}")
+            print(f"DEBUG: Unexpected error reading msg.txt from {msg_file_path}: {type(e).__name__}: {e}")
             return ""
     
     @staticmethod
@@ -104,7 +150,14 @@ class PresentNavigator:
         """
         try:
             full_path = PresentNavigator._get_full_path(folder_path)
-            
+        except ValueError:
+            return []
+        
+        cached = _cache_get(_LIST_CACHE, full_path)
+        if cached is not None:
+            return list(cached)
+        
+        try:
             items = disk_handler.list_directory(full_path)
             
             # Filter to only include directories
@@ -119,7 +172,8 @@ class PresentNavigator:
             # Sort alphabetically for consistent display
             subfolders.sort()
             
-            return subfolders
+            _LIST_CACHE[full_path] = (time.monotonic(), subfolders)
+            return list(subfolders)
         except (FileNotFoundError, APIError):
             # Folder doesn't exist or API error, return empty list
             return []
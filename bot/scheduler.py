@@ -4,26 +4,33 @@ Scheduler Module
 Schedules automatic content delivery
 """
 
+import queue
 import threading
 import time
-from datetime import datetime, time as dt_time
-from typing import List, Optional, Dict, Any, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, time as dt_time
+from typing import List, Optional, Dict, Any, Tuple, Deque
 from dataclasses import dataclass
 import telebot
 
 # Handle both package and direct execution
 try:
-    from .user_manager import UserManager
+    from .user_manager import UserManager, UserSnapshot
     from .day_calculator import DayCalculator
     from .content_fetcher import ContentFetcher
     from .content_sender import ContentSender
     from .file_id_cache import FileIdCache
+    from .present_navigator import PresentNavigator
+    from .operation_logger import get_logger
 except ImportError:
-    from user_manager import UserManager
+    from user_manager import UserManager, UserSnapshot
     from day_calculator import DayCalculator
     from content_fetcher import ContentFetcher
     from content_sender import ContentSender
     from file_id_cache import FileIdCache
+    from present_navigator import PresentNavigator
+    from operation_logger import get_logger
 
 from disk_api_handler.disk_handler import YandexDiskHandler
 
@@ -40,6 +47,21 @@ class DeliveryError:
 class ContentScheduler:
     """Schedules automatic daily content delivery."""
     
+    # Re-check interval while delivery is due but there are no users to deliver to yet
+    IDLE_RECHECK_SECONDS = 60
+    # Upper bound for a single sleep, guards against wall-clock jumps (suspend, DST)
+    MAX_SLEEP_SECONDS = 3600
+    # First retry delay after a scheduler loop error; doubles on each consecutive error
+    ERROR_BACKOFF_SECONDS = 60
+    # Default number of users delivered to in parallel (kept low for Telegram rate limits)
+    DEFAULT_DELIVERY_WORKERS = 8
+    # Number of most recent delivery errors kept for the UI
+    MAX_STORED_ERRORS = 100
+    # How long a program's day-folder listing is reused across users (seconds)
+    AVAILABLE_DAYS_TTL = 300
+    # Empty listings (new/unfilled programs) change rarely, so they are trusted for longer
+    EMPTY_AVAILABLE_DAYS_TTL = 900
+    
     def __init__(
         self,
         bot: telebot.TeleBot,
@@ -47,7 +69,10 @@ class ContentScheduler:
         disk_handler: YandexDiskHandler,
         delivery_time: dt_time = dt_time(9, 0),  # Default: 9:00 AM
         file_id_cache: Optional[FileIdCache] = None,
-        cache_chat_id: Optional[int] = None
+        cache_chat_id: Optional[int] = None,
+        delivery_workers: int = DEFAULT_DELIVERY_WORKERS,
+        checkpoint_each_day: bool = False,
+        error_queue: Optional[queue.Queue] = None
     ):
         """
         Initialize ContentScheduler.
@@ -59,21 +84,44 @@ class ContentScheduler:
             delivery_time: Time of day to deliver content (default: 9:00 AM)
             file_id_cache: Optional FileIdCache instance for caching file_ids
             cache_chat_id: Optional chat ID where files are uploaded for caching
+            delivery_workers: Number of users delivered to in parallel
+            checkpoint_each_day: If True, save last_message_date after every delivered day
+                                instead of once per user
+            error_queue: Optional queue that also receives each new delivery error (as the
+                         dicts returned by get_delivery_errors), for a UI to drain from its own thread
         """
         self.bot = bot
         self.user_manager = user_manager
         self.disk_handler = disk_handler
         self.delivery_time = delivery_time
+        self._delivery_seconds = self._to_seconds(delivery_time)  # Seconds since midnight, for cheap comparisons
         self.running = False
         self.thread = None
+        self.user_chat_map: Dict[str, int] = {}  # Replaced by start()/set_delivery_time()
+        self._wake = threading.Event()  # Set to wake the scheduler loop early (stop, reschedule)
+        
+        # Worker pool for per-user deliveries (I/O bound: Yandex Disk + Telegram)
+        self.delivery_workers = max(1, delivery_workers)
+        self.checkpoint_each_day = checkpoint_each_day
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        
+        # (program_key, max_day bucket) -> (monotonic expiry time, available days)
+        self._avail_days_cache: Dict[Tuple[str, int], Tuple[float, List[int]]] = {}
+        self._avail_days_lock = threading.Lock()
         
         # Track delivery errors for UI notification
-        self.delivery_errors: List[DeliveryError] = []
-        self.errors_lock = threading.Lock()  # Thread-safe access to errors
+        # deque append/extend/clear are atomic under the GIL, so no lock is needed for errors
+        self.delivery_errors: Deque[DeliveryError] = deque(maxlen=self.MAX_STORED_ERRORS)  # Oldest evicted first
+        self.error_queue = error_queue
         
         # Track last delivery date to avoid duplicate deliveries
         self.last_delivery_date: Optional[datetime.date] = None
-        self.delivery_lock = threading.Lock()  # Lock to prevent concurrent deliveries
+        # Bumped by set_delivery_time() on a time change, so a delivery cycle that was already
+        # running can tell it must not mark today as delivered for the new time
+        self._schedule_generation = 0
+        self._schedule_lock = threading.Lock()  # Guards last_delivery_date and _schedule_generation
+        self.delivery_lock = threading.RLock()  # Held for a whole delivery cycle (scheduled or forced)
         
         # Initialize content modules
         self.content_fetcher = ContentFetcher(disk_handler)
@@ -84,55 +132,70 @@ class ContentScheduler:
             cache_chat_id=cache_chat_id
         )
         self.day_calculator = DayCalculator()
+        self.logger = get_logger()
     
-    def _deliver_content_to_user(self, username: str, chat_id: int) -> Tuple[bool, Optional[str]]:
+    def _deliver_content_to_user(
+        self,
+        username: str,
+        chat_id: int,
+        user_snapshot: Optional[UserSnapshot] = None
+    ) -> Tuple[bool, Optional[str]]:
         """
         Deliver content to a specific user.
         Checks last_message_date and delivers all missing days.
-        Updates timestamp immediately after each successful day delivery.
+        Updates timestamp once after the last successful day (or after each day
+        when checkpoint_each_day is set).
         
         Args:
             username: Telegram username
             chat_id: Telegram chat ID
+            user_snapshot: Optional entry from UserManager.snapshot_users(). If provided,
+                          program key, begin_date and last_message_date are read from it instead of
+                          being looked up individually.
         
         Returns:
             Tuple of (success: bool, error_message: Optional[str])
             success is True if at least one day was delivered successfully
         """
         try:
-            # Check if user is registered
-            if not self.user_manager.is_user_registered(username):
-                return False, f"User {username} is not registered"
-            
-            # Get program data
-            program_data = self.user_manager.get_program_data(username)
-            if not program_data:
-                return False, f"Program data not found for {username}"
-            
-            program_key = self.user_manager.find_user_program(username)
-            begin_date = program_data.get('begin_date')
+            if user_snapshot is not None:
+                program_key, begin_date, last_message_date = user_snapshot
+            else:
+                # Check if user is registered
+                program_key = self.user_manager.find_user_program(username)
+                if not program_key:
+                    return False, f"User {username} is not registered"
+                
+                begin_date = self.user_manager.get_begin_date(username)
+                
+                # Get user's last_message_date
+                last_message_date = self.user_manager.get_user_last_message_date(username)
             
             if not begin_date:
                 return False, f"Begin date not found for {username}"
             
-            # Get user's last_message_date
-            last_message_date = self.user_manager.get_user_last_message_date(username)
+            # Parse dates once per user; the day loop below reuses these
+            begin_date_obj = self.day_calculator.parse_begin_date(begin_date)
+            last_date = None
+            if last_message_date is not None:
+                try:
+                    last_date = datetime.fromtimestamp(last_message_date).date()
+                except (ValueError, OSError):
+                    # Invalid timestamp, treat as never delivered
+                    last_date = None
             
             # Calculate which days need to be delivered based on dates
             days_to_deliver = self.day_calculator.calculate_days_to_deliver(
-                begin_date,
+                begin_date_obj,
                 last_message_date
-            )
+            ) if begin_date_obj else []
             
             # If date-based calculation returns empty, check for backlog (available days on disk)
             # But only deliver days that should be available based on begin_date
             if not days_to_deliver:
                 # Calculate current day based on begin_date
-                from datetime import date as dt_date, datetime
-                begin_date_obj = self.day_calculator.parse_begin_date(begin_date)
                 if begin_date_obj:
-                    current_date = dt_date.today()
-                    current_day = (current_date - begin_date_obj).days + 1
+                    current_day = date.today().toordinal() - begin_date_obj.toordinal() + 1
                     if current_day < 1:
                         # Program hasn't started yet, no backlog to deliver
                         return True, None
@@ -143,76 +206,80 @@ class ContentScheduler:
                 # Get available days from disk (check up to a reasonable limit to find all days)
                 # But we'll filter by current_day below
                 max_day_to_check = max(current_day, 100)  # Check at least up to day 100 to find all days
-                available_days = self.content_fetcher.get_available_days(program_key, max_day_to_check)
+                available_days = self._get_available_days_cached(program_key, max_day_to_check)
+                if not available_days:
+                    # No day folders on disk (possibly a cached "empty" listing) - nothing to deliver;
+                    # listing errors raise instead and are reported below
+                    return True, None
                 
                 # IMPORTANT: Only deliver days that are <= current_day (based on begin_date)
                 # This ensures we don't deliver future days even if they exist on disk
                 available_days = [d for d in available_days if d <= current_day]
                 
                 # Filter out days that have already been delivered
-                if last_message_date is not None:
-                    try:
-                        last_date = datetime.fromtimestamp(last_message_date).date()
-                        last_day = (last_date - begin_date_obj).days + 1
-                        # Only deliver days after the last delivered day, but still <= current_day
-                        days_to_deliver = [d for d in available_days if d > last_day]
-                    except (ValueError, OSError):
-                        # Invalid timestamp, deliver all available days up to current_day
-                        days_to_deliver = available_days
+                if last_date is not None:
+                    last_day = last_date.toordinal() - begin_date_obj.toordinal() + 1
+                    # Only deliver days after the last delivered day, but still <= current_day
+                    days_to_deliver = [d for d in available_days if d > last_day]
                 else:
-                    # No last_message_date, deliver all available days up to current_day
+                    # No (valid) last_message_date, deliver all available days up to current_day
                     days_to_deliver = available_days
             
             if not days_to_deliver:
                 # User is up to date, nothing to deliver
                 return True, None
             
+            # One listing of the program folder tells which of the days exist
+            days_content = self.content_fetcher.fetch_days_content(program_key, days_to_deliver)
+            
             # Deliver each day in sequence
             at_least_one_success = False
             last_error = None
             has_non_missing_folder_errors = False  # Track if we encountered errors other than missing folders
             
-            for day_number in days_to_deliver:
-                try:
-                    # Calculate day folder for this day
-                    day_folder = f"{day_number}_day"
-                    
-                    # Get folder path
-                    folder_path = self.day_calculator.get_program_folder_path(program_key, day_folder)
-                    
-                    # Fetch content
-                    content_data = self.content_fetcher.fetch_day_content(folder_path)
-                    
-                    # Check for errors
-                    if content_data.get('error'):
-                        error_msg = content_data['error']
-                        if error_msg == "Day folder not found":
-                            # Day not ready yet, silently skip it (don't update timestamp, don't log as error)
-                            continue
-                        else:
-                            # Other error, skip this day
+            last_written_day = None  # Latest delivered day not yet saved to handler_list.Json
+            try:
+                for day_number in days_to_deliver:
+                    try:
+                        content_data = days_content[day_number]
+                        
+                        # Check for errors
+                        if content_data.get('error'):
+                            error_msg = content_data['error']
+                            if error_msg == "Day folder not found":
+                                # Day not ready yet, silently skip it (don't update timestamp, don't log as error)
+                                continue
+                            else:
+                                # Other error, skip this day
+                                has_non_missing_folder_errors = True
+                                last_error = f"Content fetch error for day {day_number} ({username}): {error_msg}"
+                                continue
+                        
+                        # Send content
+                        success = self.content_sender.send_day_content(chat_id, content_data)
+                        if not success:
+                            # Failed to send, don't update timestamp
                             has_non_missing_folder_errors = True
-                            last_error = f"Content fetch error for day {day_number} ({username}): {error_msg}"
+                            last_error = f"Failed to send content for day {day_number} to {username}"
                             continue
-                    
-                    # Send content
-                    success = self.content_sender.send_day_content(chat_id, content_data)
-                    if not success:
-                        # Failed to send, don't update timestamp
+                        
+                        # Success! Record the day; it is written once after the loop unless checkpointing
+                        if self.checkpoint_each_day:
+                            self.user_manager.update_user_last_message_date(username, day_number, begin_date_obj)
+                        else:
+                            last_written_day = day_number
+                        at_least_one_success = True
+                        
+                    except Exception as e:
+                        # Error delivering this day, continue with next day
                         has_non_missing_folder_errors = True
-                        last_error = f"Failed to send content for day {day_number} to {username}"
+                        last_error = f"Exception delivering day {day_number} to {username}: {str(e)}"
+                        self.logger.error(last_error, exc_info=True)
                         continue
-                    
-                    # Success! Update last_message_date immediately
-                    self.user_manager.update_user_last_message_date(username, day_number, begin_date)
-                    at_least_one_success = True
-                    
-                except Exception as e:
-                    # Error delivering this day, continue with next day
-                    has_non_missing_folder_errors = True
-                    last_error = f"Exception delivering day {day_number} to {username}: {str(e)}"
-                    print(last_error)
-                    continue
+            finally:
+                # One write per user instead of one per delivered day (also runs if the loop is interrupted)
+                if last_written_day is not None:
+                    self.user_manager.update_user_last_message_date(username, last_written_day, begin_date_obj)
             
             # Return success if at least one day was delivered
             if at_least_one_success:
@@ -226,9 +293,63 @@ class ContentScheduler:
             
         except Exception as e:
             error_msg = f"Exception delivering to {username}: {str(e)}"
-            print(error_msg)
+            self.logger.error(error_msg, exc_info=True)
             return False, error_msg
     
+    def _get_available_days_cached(self, program_key: str, max_day: int, refresh: bool = False) -> List[int]:
+        """
+        Get available day numbers for a program, reusing a recent listing of the program folder.
+        
+        Args:
+            program_key: Program key (e.g., "program_1")
+            max_day: Maximum day number of interest
+            refresh: If True, bypass the cache and list the folder again
+        
+        Returns:
+            List of available day numbers (may include days above max_day; callers filter)
+        
+        Raises:
+            Exception: If the folder can't be listed. Failures are not cached, so one
+                      transient error isn't mistaken for an empty program.
+        """
+        # Round max_day up to a multiple of 10 so users on nearby days share an entry
+        max_day_bucket = -(-max_day // 10) * 10
+        key = (program_key, max_day_bucket)
+        
+        if not refresh:
+            with self._avail_days_lock:
+                entry = self._avail_days_cache.get(key)
+            if entry is not None and time.monotonic() < entry[0]:
+                return entry[1]
+        
+        # Errors propagate (uncached) and are reported per user by _deliver_content_to_user;
+        # only a real listing, possibly without day folders, is cached
+        available_days = self.content_fetcher.get_available_days(program_key, max_day_bucket, raise_errors=True)
+        ttl = self.AVAILABLE_DAYS_TTL if available_days else self.EMPTY_AVAILABLE_DAYS_TTL
+        with self._avail_days_lock:
+            self._avail_days_cache[key] = (time.monotonic() + ttl, available_days)
+        return available_days
+    
+    def _clear_available_days_cache(self) -> None:
+        """Drop all cached program day listings."""
+        with self._avail_days_lock:
+            self._avail_days_cache.clear()
+    
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """
+        Get the delivery worker pool, creating it on first use.
+        
+        Returns:
+            ThreadPoolExecutor used for per-user deliveries
+        """
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.delivery_workers,
+                    thread_name_prefix="delivery"
+                )
+            return self._pool
+    
     def schedule_delivery(self, user_chat_map: dict) -> Dict[str, Any]:
         """
         Schedule content delivery for all users.
@@ -253,8 +374,33 @@ class ContentScheduler:
         
         current_errors = []
         
-        for username, chat_id in user_chat_map.items():
-            success, error_msg = self._deliver_content_to_user(username, chat_id)
+        # The map may hold both "name" and "@name" for one user (persisted vs. live chat_ids);
+        # deliver once per user since deliveries now run concurrently from one snapshot
+        user_items = []
+        seen_usernames = set()
+        for username, chat_id in list(user_chat_map.items()):
+            normalized = username if username.startswith('@') else '@' + username
+            if normalized not in seen_usernames:
+                seen_usernames.add(normalized)
+                user_items.append((username, chat_id))
+        results['total_users'] = len(user_items)
+        
+        # Read all users' program data in one pass instead of several lookups per user
+        snapshots = self.user_manager.snapshot_users(username for username, _ in user_items)
+        
+        # Deliver to users in parallel; each user's days are still delivered in order
+        pool = self._get_pool()
+        futures = {
+            pool.submit(self._deliver_content_to_user, username, chat_id, snapshots.get(username)): (username, chat_id)
+            for username, chat_id in user_items
+        }
+        
+        for future in as_completed(futures):
+            username, chat_id = futures[future]
+            try:
+                success, error_msg = future.result()
+            except Exception as e:
+                success, error_msg = False, f"Exception delivering to {username}: {str(e)}"
             
             if success:
                 results['successful'] += 1
@@ -269,13 +415,12 @@ class ContentScheduler:
                 )
                 current_errors.append(error)
         
-        # Store errors thread-safely
+        # Store errors (deque.extend is atomic, no lock needed)
         if current_errors:
-            with self.errors_lock:
-                self.delivery_errors.extend(current_errors)
-                # Keep only last 100 errors to prevent memory issues
-                if len(self.delivery_errors) > 100:
-                    self.delivery_errors = self.delivery_errors[-100:]
+            self.delivery_errors.extend(current_errors)
+            if self.error_queue is not None:
+                for error in current_errors:
+                    self.error_queue.put(self._error_to_dict(error))
         
         results['errors'] = current_errors
         return results
@@ -294,13 +439,40 @@ class ContentScheduler:
         if self.last_delivery_date == today:
             return False
         
-        # Create delivery datetime for today
-        delivery_datetime = datetime.combine(today, self.delivery_time)
-        
         # If current time has passed delivery time today, it's time to deliver
-        result = now >= delivery_datetime
+        return self._to_seconds(now) >= self._delivery_seconds
+    
+    @staticmethod
+    def _to_seconds(value) -> int:
+        """
+        Convert the time-of-day part of a time/datetime to seconds since midnight.
+        
+        Args:
+            value: datetime.time or datetime.datetime
+        
+        Returns:
+            Seconds since midnight
+        """
+        return value.hour * 3600 + value.minute * 60 + value.second
+    
+    def _seconds_until_next_check(self) -> float:
+        """
+        Compute how long the scheduler loop can sleep before delivery is due.
+        
+        Returns:
+            Number of seconds to sleep
+        """
+        now = datetime.now()
+        today = now.date()
+        next_delivery = datetime.combine(today, self.delivery_time)
+        
+        if now >= next_delivery:
+            if self.last_delivery_date != today:
+                # Delivery is due but nothing was delivered (no users yet) - check again soon
+                return self.IDLE_RECHECK_SECONDS
+            next_delivery = datetime.combine(today + timedelta(days=1), self.delivery_time)
         
-        return result
+        return min((next_delivery - now).total_seconds(), self.MAX_SLEEP_SECONDS)
     
     def start(self, user_chat_map: dict) -> None:
         """
@@ -315,63 +487,54 @@ class ContentScheduler:
         self.user_chat_map = user_chat_map
         self.running = True
         
+        if not self.user_chat_map:
+            self.logger.info("Scheduler: No users with chat_ids found. Users need to interact with bot first to populate chat_ids.")
+        
         def run_scheduler():
-            # Wait a bit to let immediate_check run first if needed
-            time.sleep(5)
+            backoff = self.ERROR_BACKOFF_SECONDS
             
+            # First iteration runs straight away, so a start after delivery_time delivers immediately
             while self.running:
+                # Clear before the schedule is read: a reschedule from here on leaves the event
+                # set, so the wait below returns at once and the next iteration sees the new time
+                self._wake.clear()
                 try:
-                    # Check if it's delivery time (but don't check immediately - let immediate_check handle that)
-                    if self._is_delivery_time() and hasattr(self, 'user_chat_map') and self.user_chat_map:
-                        with self.delivery_lock:
-                            # Double-check after acquiring lock (another thread might have delivered)
-                            if self._is_delivery_time() and hasattr(self, 'user_chat_map') and self.user_chat_map:
-                                print(f"Scheduler: Starting delivery at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                    if self._is_delivery_time() and self.user_chat_map:
+                        if not self.delivery_lock.acquire(blocking=False):
+                            # Another delivery cycle (e.g. a forced retry) is running - don't block on it
+                            self._wake.wait(self.IDLE_RECHECK_SECONDS)
+                            continue
+                        try:
+                            # Re-check after acquiring lock (another thread might have delivered today)
+                            today = datetime.now().date()
+                            if self.last_delivery_date != today:
+                                generation = self._schedule_generation
+                                self.logger.info("Scheduler: Starting delivery to %d users at %s", len(self.user_chat_map), datetime.now())
                                 results = self.schedule_delivery(self.user_chat_map)
-                                self.last_delivery_date = datetime.now().date()
+                                with self._schedule_lock:
+                                    # A new delivery time set during the cycle still gets its delivery today
+                                    if self._schedule_generation == generation:
+                                        self.last_delivery_date = today
                                 
-                                print(f"Scheduler: Delivery completed. Successful: {results['successful']}, Failed: {results['failed']}")
+                                self.logger.info("Scheduler: Delivery completed. Successful: %d, Failed: %d", results['successful'], results['failed'])
                                 
                                 if results['failed'] > 0:
-                                    print(f"Scheduler: {len(results['errors'])} users had errors")
+                                    self.logger.warning("Scheduler: %d users had errors", len(results['errors']))
                                     for error in results['errors']:
-                                        print(f"  - {error.username}: {error.error_message}")
+                                        self.logger.warning("  - %s: %s", error.username, error.error_message)
+                        finally:
+                            self.delivery_lock.release()
+                    
+                    backoff = self.ERROR_BACKOFF_SECONDS
                     
-                    # Sleep for 1 minute before checking again
-                    time.sleep(60)  # 1 minute
+                    # Sleep until the next delivery is due (stop() wakes us early)
+                    self._wake.wait(self._seconds_until_next_check())
                     
                 except Exception as e:
-                    print(f"Scheduler error: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
-                    time.sleep(3600)  # Wait 1 hour on error
-        
-        # Check immediately on start if it's already past delivery time
-        def immediate_check():
-            # Small delay to ensure user_chat_map is set
-            time.sleep(2)
-            
-            if not self.running:
-                return
-            
-            if hasattr(self, 'user_chat_map') and self.user_chat_map:
-                if self._is_delivery_time():
-                    with self.delivery_lock:
-                        # Double-check after acquiring lock (another thread might have delivered)
-                        if self._is_delivery_time() and hasattr(self, 'user_chat_map') and self.user_chat_map:
-                            print(f"Scheduler: Immediate check - starting delivery at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                            print(f"Scheduler: Delivering to {len(self.user_chat_map)} users")
-                            results = self.schedule_delivery(self.user_chat_map)
-                            self.last_delivery_date = datetime.now().date()
-                            print(f"Scheduler: Immediate delivery completed. Successful: {results['successful']}, Failed: {results['failed']}")
-                            if results['failed'] > 0:
-                                for error in results['errors']:
-                                    print(f"  - {error.username}: {error.error_message}")
-            elif not self.user_chat_map:
-                print("Scheduler: No users with chat_ids found. Users need to interact with bot first to populate chat_ids.")
-        
-        # Run immediate check in separate thread
-        threading.Thread(target=immediate_check, daemon=True).start()
+                    self.logger.exception("Scheduler error: %s", e)
+                    # Back off exponentially (capped at MAX_SLEEP_SECONDS); stop/reschedule still wake us
+                    self._wake.wait(backoff)
+                    backoff = min(backoff * 2, self.MAX_SLEEP_SECONDS)
         
         self.thread = threading.Thread(target=run_scheduler, daemon=True)
         self.thread.start()
@@ -379,8 +542,13 @@ class ContentScheduler:
     def stop(self) -> None:
         """Stop the scheduler."""
         self.running = False
+        self._wake.set()
         if self.thread:
             self.thread.join(timeout=5)
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
     
     def is_running(self) -> bool:
         """
@@ -402,52 +570,34 @@ class ContentScheduler:
     
     def set_delivery_time(self, delivery_time: dt_time, user_chat_map: dict = None) -> None:
         """
-        Set delivery time. If scheduler is running, it will restart with new time.
+        Set delivery time. If scheduler is running, its loop is woken to re-plan with the new time.
         
         Args:
             delivery_time: New delivery time
-            user_chat_map: Optional user_chat_map to use when restarting.
-                          If not provided and scheduler is running, uses existing map.
+            user_chat_map: Optional user_chat_map to use from now on.
+                          If not provided, the existing map is kept.
         """
-        was_running = self.running
+        # delivery_lock is not taken here: it is held for a whole delivery cycle, and this
+        # is called from the GUI thread. Plain attribute assignments are atomic.
         old_time = self.delivery_time
         self.delivery_time = delivery_time
+        self._delivery_seconds = self._to_seconds(delivery_time)
         
         # Reset last delivery date when time changes (only if time actually changed)
         # This allows immediate delivery if new time has already passed today
         if old_time != delivery_time:
-            self.last_delivery_date = None
-        
-        # If scheduler was running, restart it with new time
-        if was_running:
-            self.stop()
-            # Small delay to ensure stop completes
-            time.sleep(0.5)
-            # Use provided map or existing one
-            chat_map = user_chat_map if user_chat_map is not None else getattr(self, 'user_chat_map', {})
-            self.start(chat_map)
-            
-            # Also trigger immediate check for time change
-            def check_immediately():
-                time.sleep(2)  # Small delay for scheduler to restart
-                if not self.running:
-                    return
-                if not hasattr(self, 'user_chat_map') or not self.user_chat_map:
-                    return
-                if self._is_delivery_time():
-                    print(f"Scheduler: Time changed - immediate delivery at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                    results = self.schedule_delivery(self.user_chat_map)
-                    self.last_delivery_date = datetime.now().date()
-                    print(f"Scheduler: Delivery completed. Successful: {results['successful']}, Failed: {results['failed']}")
-                    if results['failed'] > 0:
-                        for error in results['errors']:
-                            print(f"  - {error.username}: {error.error_message}")
-            
-            threading.Thread(target=check_immediately, daemon=True).start()
-        else:
-            # Even if not running, check if we should deliver immediately when it starts
-            # This is handled by immediate_check() in start()
-            pass
+            with self._schedule_lock:
+                # Keeps a delivery cycle running right now from marking today as delivered
+                self._schedule_generation += 1
+                self.last_delivery_date = None
+        
+        if user_chat_map is not None:
+            self.user_chat_map = user_chat_map
+        
+        # Wake the scheduler loop: it delivers now if the new time has passed,
+        # otherwise it sleeps until the new time. If not running, start() handles it.
+        if self.running:
+            self._wake.set()
     
     def get_delivery_errors(self, clear: bool = False) -> List[Dict[str, Any]]:
         """
@@ -459,35 +609,39 @@ class ContentScheduler:
         Returns:
             List of error dictionaries with keys: username, chat_id, error_message, timestamp
         """
-        with self.errors_lock:
-            errors = [
-                {
-                    'username': err.username,
-                    'chat_id': err.chat_id,
-                    'error_message': err.error_message,
-                    'timestamp': err.timestamp.isoformat()
-                }
-                for err in self.delivery_errors
-            ]
-            
-            if clear:
-                self.delivery_errors.clear()
-            
-            return errors
+        if clear:
+            # Swap in a fresh deque: errors recorded from now on land in the new one,
+            # so none are lost between reading and clearing
+            detached, self.delivery_errors = self.delivery_errors, deque(maxlen=self.MAX_STORED_ERRORS)
+            snapshot = list(detached)
+        else:
+            # list(deque) runs without releasing the GIL, giving a consistent snapshot
+            snapshot = list(self.delivery_errors)
+        
+        return [self._error_to_dict(err) for err in snapshot]
+    
+    @staticmethod
+    def _error_to_dict(err: DeliveryError) -> Dict[str, Any]:
+        """Convert a DeliveryError to the dict format used by the UI."""
+        return {
+            'username': err.username,
+            'chat_id': err.chat_id,
+            'error_message': err.error_message,
+            'timestamp': err.timestamp.isoformat()
+        }
     
-    def force_delivery_to_users(self, usernames: Optional[List[str]] = None) -> Dict[str, Any]:
+    def force_delivery_to_users(self, usernames: Optional[List[str]] = None, refresh: bool = True) -> Dict[str, Any]:
         """
         Force delivery to specific users (for retrying failed deliveries).
         
         Args:
             usernames: List of usernames to deliver to. If None, delivers to all users in user_chat_map
+            refresh: If True, drop cached program day listings, present listings and
+                known local downloads so retries see current disk contents
         
         Returns:
             Dictionary with delivery statistics (same format as schedule_delivery)
         """
-        if not hasattr(self, 'user_chat_map'):
-            return {'total_users': 0, 'successful': 0, 'failed': 0, 'errors': []}
-        
         if usernames is None:
             # Deliver to all users
             user_map = self.user_chat_map
@@ -499,12 +653,20 @@ class ContentScheduler:
                 if username in usernames
             }
         
-        print(f"Forcing delivery to {len(user_map)} user(s)")
-        results = self.schedule_delivery(user_map)
+        if refresh:
+            self._clear_available_days_cache()
+            # Downloaded files may have been removed from the local folder since
+            self.disk_handler.forget_downloads()
+            PresentNavigator.invalidate()
+        
+        self.logger.info("Forcing delivery to %d user(s)", len(user_map))
+        # Wait for any scheduled cycle to finish so the same users aren't delivered to twice.
+        # Reentrant, so this is also safe when called from inside a delivery cycle.
+        with self.delivery_lock:
+            results = self.schedule_delivery(user_map)
         return results
     
     def clear_delivery_errors(self) -> None:
         """Clear all stored delivery errors."""
-        with self.errors_lock:
-            self.delivery_errors.clear()
+        self.delivery_errors.clear()
 
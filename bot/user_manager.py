@@ -4,14 +4,64 @@ User Manager Module
 Handles user registration, name storage, and management in handler_list.json
 """
 
+import atexit
 import json
+import os
+import sqlite3
+import tempfile
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Any
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Iterable, List, Mapping, NamedTuple, Union
+
+# Handle both package and direct execution
+try:
+    from .day_calculator import DayCalculator
+    from .operation_logger import get_logger
+except ImportError:
+    from day_calculator import DayCalculator
+    from operation_logger import get_logger
+
+
+# Last representable moment of a day; last_message_date marks the end of the delivered day
+_END_OF_DAY = datetime.max.time()
+
+
+@lru_cache(maxsize=1024)
+def _day_end_timestamp(begin_date: date, day_number: int) -> int:
+    """
+    Unix timestamp of the end of a program day (users of one program share the result).
+    
+    Args:
+        begin_date: Program begin date (day 1)
+        day_number: Day number (1, 2, 3, etc.)
+    
+    Returns:
+        Timestamp of 23:59:59 local time on that day
+    """
+    message_date = begin_date + timedelta(days=day_number - 1)
+    return int(datetime.combine(message_date, _END_OF_DAY).timestamp())
+
+
+class UserSnapshot(NamedTuple):
+    """Delivery-relevant data for one user, captured by UserManager.snapshot_users()."""
+    program_key: str
+    begin_date: Optional[str]
+    last_message_date: Optional[int]
 
 
 class UserManager:
     """Manages user names and program assignments."""
     
+    # Stored as "_schema_version" in handler_list.json once the file is in the current format
+    SCHEMA_VERSION = 2
+    # Setter changes are written to the SQLite users table right away and folded into
+    # handler_list.json at most this long after the first unsaved change
+    # Kept short: the settings GUI rewrites the file from what it last read
+    SAVE_DELAY_SECONDS = 1.0
+    
     def __init__(self, handler_list_path: str = "handler_list.Json"):
         """
         Initialize UserManager.
@@ -20,22 +70,149 @@ class UserManager:
             handler_list_path: Path to handler_list.json file
         """
         self.handler_list_path = Path(handler_list_path)
+        # SQLite table of users changed since handler_list.json was last written
+        self.db_path = self.handler_list_path.with_suffix('.db')
+        self._conn: Optional[sqlite3.Connection] = None
         self._handler_data = None
-        self._load_handler_list()
+        self._user_index: Dict[str, str] = {}  # '@username' -> program_key
+        self._chat_id_map: Dict[str, int] = {}  # '@username' -> chat_id, only users with a chat_id
+        self._user_cache: Dict[str, Dict[str, Any]] = {}  # username as passed in -> stored user dict
+        # Guards in-memory mutations and file writes (scheduler delivers from worker threads)
+        self._lock = threading.RLock()
+        self.logger = get_logger()
+        # Pending-save state: setters mark data dirty and one timer flushes the burst
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        
+        if not self.handler_list_path.exists():
+            raise FileNotFoundError(f"Handler list file not found: {self.handler_list_path}")
+        # File is parsed (and migrated) lazily on first access
+        self._loaded = False
+        atexit.register(self.flush)
+    
+    def _ensure_loaded(self) -> None:
+        """Load handler_list.json on first access."""
+        if self._loaded:
+            return
+        # Same lock as the setters: a separate load lock could deadlock against _save_handler_list
+        with self._lock:
+            if not self._loaded:
+                self._load_handler_list()
+                self._loaded = True
     
     def _load_handler_list(self) -> None:
         """Load handler_list.json into memory and migrate old format if needed."""
         if not self.handler_list_path.exists():
             raise FileNotFoundError(f"Handler list file not found: {self.handler_list_path}")
         
-        with open(self.handler_list_path, 'r', encoding='utf-8') as f:
-            self._handler_data = json.load(f)
+        # Parse the raw bytes in one go (json detects UTF-8, with or without a BOM)
+        self._handler_data = json.loads(self.handler_list_path.read_bytes())
+        
+        # Re-apply changes stored since the last full save
+        self._open_db()
+        replayed = self._replay_pending_users()
         
         # Migrate old format to new format if needed
         self._migrate_old_format()
+        self._rebuild_user_index()
+        
+        if replayed:
+            # Fold the replayed changes into the main file and clear the pending table
+            self._save_handler_list()
+    
+    def _open_db(self) -> None:
+        """Open the SQLite database holding user changes not yet saved to handler_list.json."""
+        try:
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "username TEXT PRIMARY KEY, program TEXT NOT NULL, "
+                "name TEXT, chat_id INTEGER, last_message_date INTEGER)"
+            )
+            self._conn.commit()
+        except Exception as e:
+            # Without the database changes still reach handler_list.json via the save timer
+            self.logger.error("Error opening user database %s: %s", self.db_path, e)
+            self._conn = None
+    
+    def _replay_pending_users(self) -> int:
+        """
+        Apply users stored in the database to the loaded handler data.
+        
+        Rows for users that no longer exist (e.g. removed in the settings GUI) are skipped.
+        
+        Returns:
+            Number of users updated
+        """
+        if self._conn is None:
+            return 0
+        
+        applied = 0
+        rows = self._conn.execute("SELECT username, program, name, chat_id, last_message_date FROM users")
+        for username, program_key, name, chat_id, last_message_date in rows:
+            program_data = self._handler_data.get(program_key)
+            user_data = program_data.get(username) if isinstance(program_data, dict) else None
+            if isinstance(user_data, dict):
+                user_data['name'] = name
+                user_data['chat_id'] = chat_id
+                user_data['last_message_date'] = last_message_date
+                applied += 1
+        
+        return applied
+    
+    def _record_change(self, username: str, user_data: Dict[str, Any]) -> None:
+        """
+        Persist a changed user: write its row to the database and schedule a full save.
+        
+        Args:
+            username: Normalized Telegram username (with '@')
+            user_data: The user's stored data dict (already updated)
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?)",
+                    (
+                        username,
+                        self._user_index.get(username),
+                        user_data.get('name'),
+                        user_data.get('chat_id'),
+                        user_data.get('last_message_date')
+                    )
+                )
+                self._conn.commit()
+            self._schedule_save()
+    
+    def _rebuild_user_index(self) -> None:
+        """Rebuild the username -> program_key and username -> chat_id indexes from the loaded handler data."""
+        index = {}
+        for program_key, program_data in self._handler_data.items():
+            # Skip metadata such as "_schema_version"
+            if program_key.startswith('_') or not isinstance(program_data, dict):
+                continue
+            for key in program_data:
+                if key.startswith('@'):
+                    # First program wins if a user is listed twice (matches the old linear scan)
+                    index.setdefault(key, program_key)
+        self._user_index = index
+        
+        chat_id_map = {}
+        for username, program_key in index.items():
+            user_data = self._handler_data[program_key][username]
+            chat_id = user_data.get('chat_id') if isinstance(user_data, dict) else None
+            if chat_id:
+                chat_id_map[username] = chat_id
+        self._chat_id_map = chat_id_map
+        self._user_cache = {}
     
     def _migrate_old_format(self) -> None:
         """Migrate old format to new format (dict with name, chat_id, and last_message_date)."""
+        # Already migrated on an earlier start - skip the full scan
+        if self._handler_data.get('_schema_version') == self.SCHEMA_VERSION:
+            return
+        
         migrated = False
         for program_key, program_data in self._handler_data.items():
             if not isinstance(program_data, dict):
@@ -64,14 +241,72 @@ class UserManager:
                             value['last_message_date'] = None
                             migrated = True
         
+        # Record the schema version so later starts can skip this scan
+        self._handler_data['_schema_version'] = self.SCHEMA_VERSION
+        self._save_handler_list()
         if migrated:
-            self._save_handler_list()
-            print("Migrated handler_list.Json to new format (with name, chat_id and last_message_date support)")
+            self.logger.info("Migrated handler_list.Json to new format (with name, chat_id and last_message_date support)")
     
     def _save_handler_list(self) -> None:
-        """Save handler_list.json to disk."""
-        with open(self.handler_list_path, 'w', encoding='utf-8') as f:
-            json.dump(self._handler_data, f, indent=4, ensure_ascii=False)
+        """
+        Save handler_list.json to disk.
+        
+        Writes to a uniquely named temporary file next to it and swaps it in with os.replace,
+        so readers (e.g. the settings GUI) never see a half-written file and concurrent
+        writers never share a temporary file.
+        """
+        with self._lock:
+            # Serialize in one call; json.dump would issue many small writes
+            payload = json.dumps(self._handler_data, indent=4, ensure_ascii=False)
+            fd, tmp_name = tempfile.mkstemp(
+                dir=self.handler_list_path.parent, prefix=self.handler_list_path.name, suffix='.tmp'
+            )
+            tmp_path = Path(tmp_name)
+            try:
+                with open(fd, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(tmp_path, self.handler_list_path)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+            
+            # Everything stored so far is in the main file now
+            # (a crash before this point just replays the same values again on next start)
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM users")
+                self._conn.commit()
+    
+    def _schedule_save(self) -> None:
+        """Mark data as changed and make sure a flush is scheduled."""
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.SAVE_DELAY_SECONDS, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+    
+    def flush(self) -> None:
+        """Write pending changes to handler_list.json now (called on shutdown and by the save timer)."""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if self._dirty:
+                self._save_handler_list()
+                self._dirty = False
+    
+    @staticmethod
+    def _norm(username: str) -> str:
+        """
+        Normalize a username to the '@'-prefixed form used as handler_list keys.
+        
+        Args:
+            username: Telegram username, with or without '@'
+        
+        Returns:
+            Username with a leading '@' (the same object if it already has one)
+        """
+        return username if (username and username[0] == '@') else '@' + username
     
     def validate_name(self, name: str) -> bool:
         """
@@ -95,55 +330,55 @@ class UserManager:
         Returns:
             Program key (e.g., "program_1") if found, None otherwise
         """
-        if not username.startswith('@'):
-            username = '@' + username
-        
-        for program_key, program_data in self._handler_data.items():
-            if not isinstance(program_data, dict):
-                continue
-            if username in program_data:
-                return program_key
-        
-        return None
+        self._ensure_loaded()
+        return self._user_index.get(self._norm(username))
     
     def _get_user_data(self, username: str) -> Optional[Dict[str, Any]]:
         """
-        Get user data structure (handles both old and new format).
+        Get the stored user data dict.
+        
+        Returns the dict held in the handler data itself (not a copy), so setters can update
+        it in place; mutate it only while holding self._lock.
         
         Args:
-            username: Telegram username
+            username: Normalized Telegram username (with '@', see _norm)
         
         Returns:
-            User data dict with 'name' and 'chat_id', or None if not found
+            User data dict with 'name', 'chat_id' and 'last_message_date', or None if not found
         """
-        program_key = self.find_user_program(username)
+        program_key = self._user_index.get(username)
         if not program_key:
             return None
         
-        if not username.startswith('@'):
-            username = '@' + username
+        program_data = self._handler_data[program_key]
+        user_data = program_data.get(username)
+        if not isinstance(user_data, dict):
+            # Old format entry (plain name string) added after migration ran - upgrade it in place
+            user_data = {'name': user_data or '', 'chat_id': None, 'last_message_date': None}
+            program_data[username] = user_data
         
-        user_data = self._handler_data[program_key].get(username)
-        if user_data is None:
-            return None
+        return user_data
+    
+    def _lookup_user(self, username: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the stored user data dict for a username as received from a handler.
         
-        # Handle old format (string email/name)
-        if isinstance(user_data, str):
-            return {'name': user_data if user_data else '', 'chat_id': None, 'last_message_date': None}
+        Hits are remembered by the raw username, so repeated lookups skip normalization and
+        the index. Setters update the cached dict in place, so entries never go stale.
         
-        # Handle new format (dict)
-        if isinstance(user_data, dict):
-            # Support migration from 'email' to 'name'
-            name = user_data.get('name', '')
-            if not name and 'email' in user_data:
-                name = user_data.get('email', '')
-            return {
-                'name': name,
-                'chat_id': user_data.get('chat_id'),
-                'last_message_date': user_data.get('last_message_date')
-            }
+        Args:
+            username: Telegram username, with or without '@'
         
-        return None
+        Returns:
+            Stored user data dict, or None if not found
+        """
+        user_data = self._user_cache.get(username)
+        if user_data is None:
+            self._ensure_loaded()
+            user_data = self._get_user_data(self._norm(username))
+            if user_data is not None:
+                self._user_cache[username] = user_data
+        return user_data
     
     def is_user_registered(self, username: str) -> bool:
         """
@@ -167,12 +402,11 @@ class UserManager:
         Returns:
             Name if set, None if not set or user not found
         """
-        user_data = self._get_user_data(username)
-        if not user_data:
+        user_data = self._lookup_user(username)
+        if user_data is None:
             return None
         
-        name = user_data.get('name', '')
-        return name if name else None
+        return user_data.get('name') or None
     
     def get_user_chat_id(self, username: str) -> Optional[int]:
         """
@@ -184,8 +418,8 @@ class UserManager:
         Returns:
             Chat ID if set, None if not set or user not found
         """
-        user_data = self._get_user_data(username)
-        if not user_data:
+        user_data = self._lookup_user(username)
+        if user_data is None:
             return None
         
         return user_data.get('chat_id')
@@ -201,36 +435,22 @@ class UserManager:
         Returns:
             True if successful, False if user not found
         """
-        program_key = self.find_user_program(username)
-        if not program_key:
-            return False
-        
-        if not username.startswith('@'):
-            username = '@' + username
-        
-        # Ensure user data is in new format
-        user_data = self._get_user_data(username)
-        if user_data is None:
-            return False
-        
-        # Update chat_id
-        if not isinstance(self._handler_data[program_key][username], dict):
-            # Convert to new format if needed
-            name = user_data.get('name', '')
-            last_message_date = user_data.get('last_message_date')
-            self._handler_data[program_key][username] = {
-                'name': name,
-                'chat_id': chat_id,
-                'last_message_date': last_message_date
-            }
-        else:
-            self._handler_data[program_key][username]['chat_id'] = chat_id
-            # Ensure last_message_date exists
-            if 'last_message_date' not in self._handler_data[program_key][username]:
-                self._handler_data[program_key][username]['last_message_date'] = None
-        
-        self._save_handler_list()
-        return True
+        with self._lock:
+            user_data = self._lookup_user(username)
+            if user_data is None:
+                return False
+            
+            username = self._norm(username)
+            user_data['chat_id'] = chat_id
+            
+            # Keep the chat_id index in sync
+            if chat_id:
+                self._chat_id_map[username] = chat_id
+            else:
+                self._chat_id_map.pop(username, None)
+            
+            self._record_change(username, user_data)
+            return True
     
     def set_user_name(self, username: str, name: str) -> bool:
         """
@@ -243,30 +463,18 @@ class UserManager:
         Returns:
             True if successful, False if validation fails or user not found
         """
-        if not self.validate_name(name):
-            return False
-        
-        program_key = self.find_user_program(username)
-        if not program_key:
-            return False
-        
-        if not username.startswith('@'):
-            username = '@' + username
-        
-        # Get existing chat_id and last_message_date if any
-        user_data = self._get_user_data(username)
-        chat_id = user_data.get('chat_id') if user_data else None
-        last_message_date = user_data.get('last_message_date') if user_data else None
-        
-        # Update in new format
-        self._handler_data[program_key][username] = {
-            'name': name.strip(),
-            'chat_id': chat_id,
-            'last_message_date': last_message_date
-        }
-        
-        self._save_handler_list()
-        return True
+        with self._lock:
+            if not self.validate_name(name):
+                return False
+            
+            user_data = self._lookup_user(username)
+            if user_data is None:
+                return False
+            
+            user_data['name'] = name.strip()
+            
+            self._record_change(self._norm(username), user_data)
+            return True
     
     def get_all_users_with_chat_ids(self) -> Dict[str, int]:
         """
@@ -275,21 +483,46 @@ class UserManager:
         Returns:
             Dictionary mapping username to chat_id (only users with chat_id set)
         """
-        user_chat_map = {}
-        for program_key, program_data in self._handler_data.items():
-            if not isinstance(program_data, dict):
-                continue
-            for key, value in program_data.items():
-                if key == 'begin_date':
-                    continue
-                if key.startswith('@'):
-                    user_data = self._get_user_data(key)
-                    if user_data and user_data.get('chat_id'):
-                        user_chat_map[key] = user_data['chat_id']
+        self._ensure_loaded()
+        with self._lock:
+            return self._chat_id_map.copy()
+    
+    def snapshot_users(self, usernames: Iterable[str]) -> Dict[str, UserSnapshot]:
+        """
+        Collect delivery-relevant data for many users in a single pass.
         
-        return user_chat_map
+        Args:
+            usernames: Telegram usernames (with or without '@')
+        
+        Returns:
+            Dictionary mapping each registered username (as passed in) to its UserSnapshot.
+            Unregistered users are omitted.
+        """
+        # normalized username -> usernames as passed in
+        wanted: Dict[str, List[str]] = {}
+        for username in usernames:
+            wanted.setdefault(self._norm(username), []).append(username)
+        
+        self._ensure_loaded()
+        snapshots = {}
+        with self._lock:
+            for normalized, originals in wanted.items():
+                program_key = self._user_index.get(normalized)
+                if not program_key:
+                    continue
+                program_data = self._handler_data[program_key]
+                value = program_data[normalized]
+                snapshot = UserSnapshot(
+                    program_key,
+                    program_data.get('begin_date'),
+                    value.get('last_message_date') if isinstance(value, dict) else None
+                )
+                for original in originals:
+                    snapshots[original] = snapshot
+        
+        return snapshots
     
-    def get_program_data(self, username: str) -> Optional[Dict[str, Any]]:
+    def get_program_data(self, username: str) -> Optional[Mapping[str, Any]]:
         """
         Get program data for a user (including begin_date).
         
@@ -297,13 +530,29 @@ class UserManager:
             username: Telegram username
         
         Returns:
-            Program data dictionary if found, None otherwise
+            Read-only view of the program data if found, None otherwise
         """
         program_key = self.find_user_program(username)
         if not program_key:
             return None
         
-        return self._handler_data[program_key].copy()
+        return MappingProxyType(self._handler_data[program_key])
+    
+    def get_begin_date(self, username: str) -> Optional[str]:
+        """
+        Get the begin_date of the user's program.
+        
+        Args:
+            username: Telegram username
+        
+        Returns:
+            Begin date string in format "YYYY-MM-DD", or None if user or date not found
+        """
+        program_key = self.find_user_program(username)
+        if not program_key:
+            return None
+        
+        return self._handler_data[program_key].get('begin_date')
     
     def needs_name(self, username: str) -> bool:
         """
@@ -328,8 +577,8 @@ class UserManager:
         Returns:
             Unix timestamp (seconds since epoch) if set, None if not set or user not found
         """
-        user_data = self._get_user_data(username)
-        if not user_data:
+        user_data = self._lookup_user(username)
+        if user_data is None:
             return None
         
         return user_data.get('last_message_date')
@@ -345,58 +594,39 @@ class UserManager:
         Returns:
             True if successful, False if user not found
         """
-        program_key = self.find_user_program(username)
-        if not program_key:
-            return False
-        
-        if not username.startswith('@'):
-            username = '@' + username
-        
-        # Ensure user data is in new format
-        user_data = self._get_user_data(username)
-        if user_data is None:
-            return False
-        
-        # Update last_message_date
-        if not isinstance(self._handler_data[program_key][username], dict):
-            # Convert to new format if needed
-            name = user_data.get('name', '')
-            chat_id = user_data.get('chat_id')
-            self._handler_data[program_key][username] = {
-                'name': name,
-                'chat_id': chat_id,
-                'last_message_date': timestamp
-            }
-        else:
-            self._handler_data[program_key][username]['last_message_date'] = timestamp
-        
-        self._save_handler_list()
-        return True
+        with self._lock:
+            user_data = self._lookup_user(username)
+            if user_data is None:
+                return False
+            
+            user_data['last_message_date'] = timestamp
+            
+            self._record_change(self._norm(username), user_data)
+            return True
     
-    def update_user_last_message_date(self, username: str, day_number: int, begin_date: str) -> bool:
+    def update_user_last_message_date(self, username: str, day_number: int, begin_date: Union[str, date]) -> bool:
         """
         Calculate and set last_message_date based on day number and begin_date.
         
         Args:
             username: Telegram username
             day_number: Day number (1, 2, 3, etc.)
-            begin_date: Begin date string in format "YYYY-MM-DD"
+            begin_date: Begin date string in format "YYYY-MM-DD", or an already
+                       parsed date (skips re-parsing when called in a loop)
         
         Returns:
             True if successful, False otherwise
         """
-        from datetime import datetime, timedelta
-        
         try:
-            begin_date_obj = datetime.strptime(begin_date, "%Y-%m-%d").date()
-            # Calculate the date for this day (day 1 = begin_date, day 2 = begin_date + 1, etc.)
-            message_date = begin_date_obj + timedelta(days=day_number - 1)
-            # Convert to Unix timestamp (end of day to ensure we've delivered that day's content)
-            message_datetime = datetime.combine(message_date, datetime.max.time())
-            timestamp = int(message_datetime.timestamp())
+            # Same parser as day calculation, so any begin_date the bot delivers for is accepted here
+            begin_date_obj = DayCalculator.parse_begin_date(begin_date)
+            if begin_date_obj is None:
+                raise ValueError(f"Invalid begin_date: {begin_date!r}")
+            # End of the day's date (day 1 = begin_date), so that day's content counts as delivered
+            timestamp = _day_end_timestamp(begin_date_obj, day_number)
             
             return self.set_user_last_message_date(username, timestamp)
         except (ValueError, TypeError) as e:
-            print(f"Error calculating last_message_date for {username}: {e}")
+            self.logger.error("Error calculating last_message_date for %s: %s", username, e)
             return False
 
@@ -5,15 +5,70 @@ This module provides functionality to list, download, and publish files on Yande
 """
 
 import io
+import logging
+import os
+import threading
 import time
 import yadisk
 import yadisk.exceptions as yadisk_exceptions
-from typing import List, Optional, Dict, Any
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Dict, Any, Iterable, Sequence, Union
 from pathlib import Path
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from yadisk.sessions.requests_session import RequestsSession
 from yadisk.types import AvailableUntilVerbose, PublicSettings, PublicSettingsAccess
 
 
+# Child of the bot's operation logger, so records reach its handlers when the bot runs
+logger = logging.getLogger('bot_operations.disk_handler')
+
+_IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', '.ico', '.tiff', '.tif'})
+
+
+@lru_cache(maxsize=1024)
+def _normalize_disk_path(path: str) -> str:
+    """
+    Convert a path to "disk:/bot/..." form; see YandexDiskHandler._normalize_path.
+    
+    Args:
+        path: Path to normalize.
+    
+    Returns:
+        Normalized path string with "bot/" prefix.
+    """
+    # Handle empty string as root
+    if not path or path == "/":
+        return "disk:/bot"
+    
+    # First, normalize to "disk:/" format
+    if not path.startswith("disk:/"):
+        if path.startswith("/"):
+            normalized = "disk:" + path
+        else:
+            normalized = "disk:/" + path
+    else:
+        normalized = path
+    
+    # Handle root case
+    if normalized == "disk:/":
+        return "disk:/bot"
+    
+    # Check if path already starts with "disk:/bot/" or is exactly "disk:/bot" to avoid double-prefixing
+    if normalized.startswith("disk:/bot/") or normalized == "disk:/bot":
+        return normalized
+    
+    # Insert "bot/" after "disk:/"
+    # "disk:/path" -> "disk:/bot/path"
+    if normalized.startswith("disk:/"):
+        return "disk:/bot/" + normalized[6:]  # Remove "disk:/" (6 chars), add "disk:/bot/"
+    
+    # Fallback (shouldn't reach here, but just in case)
+    return normalized
+
+
 # Custom Exceptions
 class YandexDiskAPIError(Exception):
     """Base exception for Yandex Disk API errors."""
@@ -34,6 +89,35 @@ class APIError(YandexDiskAPIError):
         self.response_text = response_text
 
 
+class PooledRequestsSession(RequestsSession):
+    """
+    yadisk requests session with a keep-alive connection pool.
+    
+    RequestsSession creates one requests.Session per thread on first use, so the
+    pooled adapter is mounted on each of them as they are created. Connection
+    failures are retried by the adapter; HTTP error statuses are left to yadisk,
+    which already retries them on its own.
+    """
+    
+    POOL_CONNECTIONS = 16
+    POOL_MAXSIZE = 32
+    
+    @property
+    def requests_session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = super().requests_session
+            adapter = HTTPAdapter(
+                pool_connections=self.POOL_CONNECTIONS,
+                pool_maxsize=self.POOL_MAXSIZE,
+                max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.3)
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Connection"] = "keep-alive"
+        return session
+
+
 class YandexDiskHandler:
     """
     Handler for listing, downloading, and publishing files on Yandex Disk.
@@ -46,6 +130,16 @@ class YandexDiskHandler:
     """
     
     BASE_API_URL = "https://cloud-api.yandex.net/v1/disk"
+    LISTDIR_TTL = 60  # Seconds a directory listing is reused before querying the API again
+    DOWNLOAD_WORKERS = 5  # Default number of files download_files() fetches at once
+    DOWNLOAD_BUFFER_SIZE = 1 << 20  # Write buffer for downloaded files (1 MB)
+    PUBLIC_URL_ATTEMPTS = 3  # get_meta lookups for the public URL of a freshly published resource
+    PUBLIC_URL_BACKOFF = 0.25  # Seconds before the second lookup; doubles after each attempt
+    # ResourceObject attributes copied by _resource_to_dict()
+    RESOURCE_FIELDS = ('name', 'type', 'path', 'size', 'modified', 'created', 'mime_type',
+                       'md5', 'public_url', 'public_key', 'preview', 'file', 'href')
+    # Item fields list_directory() requests by default
+    LISTDIR_FIELDS = ('name', 'type', 'path', 'size', 'modified', 'mime_type', 'md5')
     
     def __init__(self, token_file: str = "ya_api_token.txt", token: Optional[str] = None):
         """
@@ -76,7 +170,16 @@ class YandexDiskHandler:
             raise APIError("API token is empty")
         
         # Initialize yadisk client
-        self.client = yadisk.Client(token=self.token)
+        self.client = yadisk.Client(token=self.token, session=PooledRequestsSession())
+        
+        # (normalized_path, limit, offset, fields) -> (monotonic timestamp, listing)
+        self._listdir_cache: Dict[tuple, tuple] = {}
+        self._cache_lock = threading.Lock()  # Guards the listing and download caches
+        # (cloud path, download folder) -> local path of a file known to be downloaded
+        self._download_index: Dict[tuple, str] = {}
+        # (cloud path, download folder) -> Future of the download in progress, so concurrent
+        # requests for the same file wait for one download instead of each fetching it
+        self._downloads_in_flight: Dict[tuple, Future] = {}
     
     def _normalize_path(self, path: str) -> str:
         """
@@ -93,34 +196,10 @@ class YandexDiskHandler:
         Returns:
             Normalized path string with "bot/" prefix (e.g., "disk:/bot/path").
         """
-        # Handle empty string as root
-        if not path or path == "/":
-            return "disk:/bot"
-        
-        # First, normalize to "disk:/" format
-        if not path.startswith("disk:/"):
-            if path.startswith("/"):
-                normalized = "disk:" + path
-            else:
-                normalized = "disk:/" + path
-        else:
-            normalized = path
-        
-        # Handle root case
-        if normalized == "disk:/":
-            return "disk:/bot"
-        
-        # Check if path already starts with "disk:/bot/" or is exactly "disk:/bot" to avoid double-prefixing
-        if normalized.startswith("disk:/bot/") or normalized == "disk:/bot":
-            return normalized
-        
-        # Insert "bot/" after "disk:/"
-        # "disk:/path" -> "disk:/bot/path"
-        if normalized.startswith("disk:/"):
-            return "disk:/bot/" + normalized[6:]  # Remove "disk:/" (6 chars), add "disk:/bot/"
-        
-        # Fallback (shouldn't reach here, but just in case)
-        return normalized
+        # Fast path: most callers pass paths this handler already produced
+        if path.startswith("disk:/bot/") or path == "disk:/bot":
+            return path
+        return _normalize_disk_path(path)
     
     def _handle_sdk_exception(self, exception: Exception) -> None:
         """
@@ -135,18 +214,12 @@ class YandexDiskHandler:
         """
         if isinstance(exception, yadisk_exceptions.PathNotFoundError):
             raise FileNotFoundError(f"Resource not found: {str(exception)}") from exception
-        elif isinstance(exception, (yadisk_exceptions.YaDiskError, yadisk_exceptions.BadRequestError, 
-                                   yadisk_exceptions.UnauthorizedError, yadisk_exceptions.ForbiddenError,
-                                   yadisk_exceptions.NotFoundError, yadisk_exceptions.ConflictError, 
-                                   yadisk_exceptions.PayloadTooLargeError, yadisk_exceptions.UnsupportedMediaTypeError, 
-                                   yadisk_exceptions.UnprocessableEntityError, yadisk_exceptions.TooManyRequestsError, 
-                                   yadisk_exceptions.InternalServerErrorError, yadisk_exceptions.NotImplementedError, 
-                                   yadisk_exceptions.BadGatewayError, yadisk_exceptions.ServiceUnavailableError, 
-                                   yadisk_exceptions.GatewayTimeoutError, yadisk_exceptions.RequestError)):
-            # Extract status code if available
-            status_code = getattr(exception, 'status_code', None)
-            error_msg = str(exception)
-            raise APIError(error_msg, status_code=status_code) from exception
+        elif isinstance(exception, yadisk_exceptions.YaDiskError):
+            # Every SDK error (HTTP status errors and RequestError alike) derives from YaDiskError
+            raise APIError(str(exception), status_code=getattr(exception, 'status_code', None)) from exception
+        elif isinstance(exception, YandexDiskAPIError):
+            # Already one of ours (raised inside the handler's own try block)
+            raise exception
         else:
             # For any other exception, wrap it as APIError
             raise APIError(f"Unexpected error: {str(exception)}") from exception
@@ -164,16 +237,9 @@ class YandexDiskHandler:
         if isinstance(resource, dict):
             return resource
         
-        # If it's a ResourceObject, convert to dict
-        result = {}
-        for key in ['name', 'type', 'path', 'size', 'modified', 'created', 'mime_type', 
-                   'md5', 'public_url', 'public_key', 'preview', 'file', 'href']:
-            if hasattr(resource, key):
-                value = getattr(resource, key)
-                if value is not None:
-                    result[key] = value
-        
-        return result
+        # If it's a ResourceObject, convert to dict (one getattr per field, missing -> None)
+        values = [(key, getattr(resource, key, None)) for key in self.RESOURCE_FIELDS]
+        return {key: value for key, value in values if value is not None}
     
     def publish_temporary_link(self, file_path: str, expiration_seconds: int = 30) -> dict:
         """
@@ -227,25 +293,21 @@ class YandexDiskHandler:
                 normalized_path,
                 public_settings=public_settings
             )
-            print(public_settings)
-            print(link_object)
+            # The parent's cached listing carries this item's (now stale) public_url
+            self.invalidate_listdir(normalized_path.rsplit('/', 1)[0])
+            logger.debug("Published %s with %s -> %s", normalized_path, public_settings, link_object)
             
-            # Get public URL from the link object
+            # The link object's href points at the resource in the REST API (it needs the
+            # OAuth token), so read the public URL from the resource meta right away,
+            # backing off only while the link propagates
             result = {}
-            if link_object:
-                # Link object has href attribute
-                public_url = getattr(link_object, 'href', None)
+            for attempt in range(self.PUBLIC_URL_ATTEMPTS):
+                public_url = self._get_public_url(normalized_path)
                 if public_url:
                     result['public_url'] = public_url
-                # Also try to get from meta
-                if not public_url:
-                    for attempt in range(3):
-                        public_url = self._get_public_url(file_path)
-                        if public_url:
-                            result['public_url'] = public_url
-                            break
-                        if attempt < 2:
-                            time.sleep(0.5)
+                    break
+                if attempt < self.PUBLIC_URL_ATTEMPTS - 1:
+                    time.sleep(self.PUBLIC_URL_BACKOFF * 2 ** attempt)
             
             return result
         except Exception as e:
@@ -266,13 +328,8 @@ class YandexDiskHandler:
             # Normalize path format
             normalized_path = self._normalize_path(file_path)
             
-            # Get metadata with public_url field
-            # Try with fields parameter first
-            try:
-                meta = self.client.get_meta(normalized_path, fields=["public_url"])
-            except Exception:
-                # If fields parameter fails, try without it
-                meta = self.client.get_meta(normalized_path)
+            # Get metadata with only the public_url field
+            meta = self.client.get_meta(normalized_path, fields=["public_url"])
             
             if meta:
                 # Try to get public_url from meta object
@@ -296,7 +353,13 @@ class YandexDiskHandler:
             # For other exceptions, also return None silently
             return None
     
-    def list_directory(self, path: str = "/", limit: Optional[int] = None, offset: Optional[int] = None) -> List[Dict[str, Any]]:
+    def list_directory(
+        self,
+        path: str = "/",
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        fields: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
         """
         List files and folders in a directory (similar to 'ls' command).
         
@@ -304,67 +367,65 @@ class YandexDiskHandler:
             path: Path to the directory on Yandex Disk. Defaults to "/" (root).
             limit: Optional limit on the number of items to return.
             offset: Optional offset for pagination.
+            fields: Item fields to request from the API. Defaults to LISTDIR_FIELDS;
+                    pass e.g. RESOURCE_FIELDS to also get created, public_url, public_key, etc.
         
         Returns:
-            List of dictionaries containing item information. Each dictionary includes:
+            List of dictionaries containing item information. With the default fields
+            each dictionary includes:
             - name: Item name
             - type: Item type ("file" or "dir")
             - path: Full path to the item
             - size: File size in bytes (only for files)
             - modified: Modification date/time
-            - created: Creation date/time (if available)
             - mime_type: MIME type (for files)
             - md5: MD5 hash (for files)
-            - public_url: Public URL (if published)
-            - public_key: Public key (if published)
         
         Raises:
             APIError: For API errors.
             FileNotFoundError: If the directory doesn't exist.
         """
+        # Normalize path format
+        normalized_path = self._normalize_path(path)
+        fields = self.LISTDIR_FIELDS if fields is None else tuple(fields)
+        key = (normalized_path, limit, offset, fields)
+        
+        with self._cache_lock:
+            entry = self._listdir_cache.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.LISTDIR_TTL:
+            # Copies, so callers can't modify the cached listing
+            return [item.copy() for item in entry[1]]
+        
         try:
-            # Normalize path format
-            normalized_path = self._normalize_path(path)
-            
             # Use SDK's listdir method
-            items = list(self.client.listdir(normalized_path, limit=limit, offset=offset))
+            items = list(self.client.listdir(normalized_path, limit=limit, offset=offset, fields=list(fields)))
             
             # Convert ResourceObject items to dictionaries
-            return [self._resource_to_dict(item) for item in items]
+            result = [self._resource_to_dict(item) for item in items]
         except Exception as e:
             self._handle_sdk_exception(e)
+        
+        with self._cache_lock:
+            self._listdir_cache[key] = (time.monotonic(), result)
+        return [item.copy() for item in result]
     
-    def _get_download_url(self, file_path: str) -> str:
+    def invalidate_listdir(self, path: Optional[str] = None) -> None:
         """
-        Get the download URL for a file on Yandex Disk.
+        Drop cached directory listings.
         
         Args:
-            file_path: Path to the file on Yandex Disk.
-        
-        Returns:
-            Download URL string.
-        
-        Raises:
-            APIError: For API errors.
-            FileNotFoundError: If the file doesn't exist.
+            path: Directory whose listings should be dropped. If None, clears the whole cache.
         """
-        try:
-            # Normalize path format
-            if not file_path.startswith("disk:/") and file_path != "/":
-                if file_path.startswith("/"):
-                    file_path = "disk:" + file_path
-                else:
-                    file_path = "disk:/" + file_path
-            
-            # Use SDK's get_download_link method
-            download_url = self.client.get_download_link(file_path)
-            if not download_url:
-                raise APIError("Download URL not found in API response")
-            return download_url
-        except Exception as e:
-            self._handle_sdk_exception(e)
+        with self._cache_lock:
+            if path is None:
+                self._listdir_cache.clear()
+                return
+            normalized_path = self._normalize_path(path)
+            for key in [key for key in self._listdir_cache if key[0] == normalized_path]:
+                del self._listdir_cache[key]
     
-    def _is_image_file(self, file_path: str) -> bool:
+    @staticmethod
+    def _is_image_file(file_path: str) -> bool:
         """
         Check if a file is an image based on its extension.
         
@@ -374,9 +435,7 @@ class YandexDiskHandler:
         Returns:
             True if the file is an image, False otherwise.
         """
-        image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', '.ico', '.tiff', '.tif'}
-        file_ext = Path(file_path).suffix.lower()
-        return file_ext in image_extensions
+        return os.path.splitext(file_path)[1].lower() in _IMAGE_EXTENSIONS
     
     def _cloud_path_to_local_path(self, cloud_path: str, download_folder: str = "downloads") -> str:
         """
@@ -408,13 +467,11 @@ class YandexDiskHandler:
         # If path is empty after stripping, it's a root file
         if not relative_path:
             # This shouldn't happen for files, but handle it
-            filename = Path(cloud_path).name
-            return str(Path(download_folder) / filename)
-        
-        # Build local path preserving structure
-        local_path = Path(download_folder) / relative_path
+            filename = cloud_path.rsplit('/', 1)[-1]
+            return os.path.join(download_folder, filename)
         
-        return str(local_path)
+        # Build local path preserving structure (with the OS separator, as pathlib did)
+        return os.path.join(download_folder, *relative_path.split('/'))
     
     def get_text_file_content(self, file_path: str, encoding: str = 'utf-8') -> str:
         """
@@ -439,11 +496,9 @@ class YandexDiskHandler:
             # Download to memory buffer
             buffer = io.BytesIO()
             self.client.download(normalized_path, buffer)
-            buffer.seek(0)
             
-            # Decode content
-            content = buffer.read().decode(encoding)
-            return content
+            # Decode straight from the buffer's bytes, without a seek() + read() copy
+            return buffer.getvalue().decode(encoding)
         except UnicodeDecodeError as e:
             raise APIError(f"Failed to decode file with encoding '{encoding}': {str(e)}") from e
         except Exception as e:
@@ -476,28 +531,164 @@ class YandexDiskHandler:
             APIError: For API errors.
             FileNotFoundError: If the file doesn't exist on Yandex Disk.
         """
+        # Files this handler has already seen on disk are returned without touching the filesystem
+        index_key = (file_path, download_folder)
+        with self._cache_lock:
+            local_file_path = self._download_index.get(index_key)
+        if local_file_path is not None:
+            return local_file_path
+        
+        # Only one thread downloads a given file; the others wait for its result
+        with self._cache_lock:
+            in_flight = self._downloads_in_flight.get(index_key)
+            if in_flight is None:
+                in_flight = Future()
+                self._downloads_in_flight[index_key] = in_flight
+                is_owner = True
+            else:
+                is_owner = False
+        if not is_owner:
+            return in_flight.result()
+        
+        try:
+            local_file_path = self._download_to_local(file_path, download_folder, index_key)
+        except BaseException as e:
+            in_flight.set_exception(e)
+            raise
+        else:
+            in_flight.set_result(local_file_path)
+            return local_file_path
+        finally:
+            with self._cache_lock:
+                self._downloads_in_flight.pop(index_key, None)
+    
+    def _download_to_local(self, file_path: str, download_folder: str, index_key: tuple) -> str:
+        """
+        Download a file unless it already exists locally (see download_file()).
+        
+        Only called by the thread that owns the download of index_key.
+        
+        Returns:
+            Path to the local file.
+        """
         # Convert cloud path to local path with folder structure
         local_file_path = self._cloud_path_to_local_path(file_path, download_folder)
-        local_path_obj = Path(local_file_path)
         
-        # Check if file already exists
-        if local_path_obj.exists():
+        # Check if file already exists with a single stat() call
+        try:
+            os.stat(local_file_path)
             # File already downloaded, return existing path
-            return str(local_file_path)
+            with self._cache_lock:
+                self._download_index[index_key] = local_file_path
+            return local_file_path
+        except OSError:
+            pass
         
         # Create parent directories if they don't exist
-        local_path_obj.parent.mkdir(parents=True, exist_ok=True)
+        os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+        
+        # Download to a temporary file and rename it into place, so a partially written file
+        # is never seen by the existence check
+        temp_file_path = f"{local_file_path}.{threading.get_ident()}.part"
         
         try:
             # Normalize path format for SDK
             normalized_path = self._normalize_path(file_path)
             
-            # Use SDK to download directly to file
-            self.client.download(normalized_path, str(local_file_path))
+            # Use SDK to download directly to file; the large write buffer turns its
+            # 8 KB chunks into a few big write() calls
+            with open(temp_file_path, 'wb', buffering=self.DOWNLOAD_BUFFER_SIZE) as temp_file:
+                self.client.download(normalized_path, temp_file)
+            os.replace(temp_file_path, local_file_path)
+            with self._cache_lock:
+                self._download_index[index_key] = local_file_path
             
-            return str(local_file_path)
+            return local_file_path
         except IOError as e:
             raise APIError(f"Failed to save file to {local_file_path}: {str(e)}") from e
         except Exception as e:
             self._handle_sdk_exception(e)
+        finally:
+            if os.path.exists(temp_file_path):
+                try:
+                    os.remove(temp_file_path)
+                except OSError:
+                    pass
+    
+    def forget_downloads(self) -> None:
+        """
+        Forget which files download_file() has already seen on disk.
+        
+        Call this after deleting files from the download folder, so they are
+        checked for (and downloaded) again.
+        """
+        with self._cache_lock:
+            self._download_index.clear()
+    
+    def download_files(
+        self,
+        file_paths: Sequence[str],
+        download_folder: str = "downloads",
+        max_workers: Optional[int] = None
+    ) -> List[Union[str, YandexDiskAPIError]]:
+        """
+        Download several files from Yandex Disk concurrently.
+        
+        Each file is fetched with download_file() on a small thread pool, so the
+        round-trips for independent files overlap instead of running back to back.
+        A failed file does not stop the others.
+        
+        Args:
+            file_paths: Paths to the files on Yandex Disk.
+            download_folder: Base folder for downloads. Defaults to "downloads".
+            max_workers: Maximum number of simultaneous downloads.
+                        Defaults to DOWNLOAD_WORKERS.
+        
+        Returns:
+            List in the same order as file_paths. Each entry is either the local path
+            of the downloaded file or the APIError/FileNotFoundError raised for it.
+        """
+        def download_one(file_path: str) -> Union[str, YandexDiskAPIError]:
+            try:
+                return self.download_file(file_path, download_folder)
+            except YandexDiskAPIError as e:
+                return e
+        
+        if len(file_paths) <= 1:
+            return [download_one(file_path) for file_path in file_paths]
+        
+        workers = min(max_workers or self.DOWNLOAD_WORKERS, len(file_paths))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="yadisk-download") as executor:
+            return list(executor.map(download_one, file_paths))
 
+# Handlers shared by every caller in the process, keyed by where the token came from
+_shared_handlers: Dict[tuple, YandexDiskHandler] = {}
+_shared_handlers_lock = threading.Lock()
+
+
+def get_shared_handler(token_file: str = "ya_api_token.txt", token: Optional[str] = None) -> YandexDiskHandler:
+    """
+    Get the process-wide YandexDiskHandler for a token, creating it on first use.
+    
+    The bot and the settings UI run in one process; sharing the handler lets them
+    reuse the same HTTP connections and listing/download caches.
+    
+    Args:
+        token_file: Path to the file containing the Yandex API token.
+                   Ignored if token parameter is provided.
+        token: Optional token string.
+    
+    Returns:
+        Shared YandexDiskHandler instance.
+    
+    Raises:
+        FileNotFoundError: If the token file doesn't exist and token is not provided.
+        APIError: If the token is empty.
+    """
+    key = ('token', token.strip()) if token is not None else ('file', os.path.abspath(token_file))
+    with _shared_handlers_lock:
+        handler = _shared_handlers.get(key)
+        if handler is None:
+            handler = YandexDiskHandler(token_file=token_file, token=token)
+            _shared_handlers[key] = handler
+        return handler
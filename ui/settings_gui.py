@@ -8,9 +8,15 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 import configparser
 import json
+import queue
+import tempfile
 import threading
-import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import os
+from datetime import time as dt_time
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 
@@ -19,7 +25,7 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from bot.bot import DailyContentBot
-from disk_api_handler.disk_handler import YandexDiskHandler, APIError
+from disk_api_handler.disk_handler import APIError, get_shared_handler
 
 # Import logger for GUI operations
 try:
@@ -27,22 +33,121 @@ try:
 except ImportError:
     from operation_logger import get_logger
 
+# watchdog is optional: without it the settings files are polled with Tk after()
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+# Users tree row parts shared by every insert
+_PROGRAM_PREFIX = "📁 "  # Program rows show this before the program key
+_PROGRAM_TAGS = ("program",)
+_USER_TAGS = ("user",)
+_ADD_TAGS = ("add_button",)
+_LAZY_TAGS = ("lazy",)
+_EMPTY_VALUES = ("", "")
+
+
+@lru_cache(maxsize=128)
+def _parse_delivery_time(time_str: str) -> dt_time:
+    """
+    Parse a delivery time entered as HH:MM.
+    
+    Args:
+        time_str: Time string, e.g. "09:00"
+    
+    Returns:
+        Parsed time of day.
+    
+    Raises:
+        ValueError: If the string isn't a valid HH:MM time.
+    """
+    parts = time_str.split(':')
+    if len(parts) != 2:
+        raise ValueError("Invalid format")
+    hour = int(parts[0])
+    minute = int(parts[1])
+    if hour < 0 or hour > 23 or minute < 0 or minute > 59:
+        raise ValueError("Invalid time range")
+    return dt_time(hour, minute)
+
+
+class _WatchedFilesHandler(FileSystemEventHandler):
+    """watchdog handler calling back when one of the given files is written, created or replaced."""
+    
+    def __init__(self, file_names, callback):
+        super().__init__()
+        self.file_names = {os.path.normcase(name) for name in file_names}
+        self.callback = callback
+    
+    def on_any_event(self, event):
+        # Atomic saves show up as a move onto the file, so check the destination too
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if path and os.path.normcase(os.path.basename(path)) in self.file_names:
+                self.callback()
+                return
+
 
 class BotSettingsGUI:
     """Main GUI application for bot settings management."""
     
+    WINDOW_SIZE = (1000, 750)  # Initial window width and height
+    BACKGROUND_WORKERS = 4  # Threads for short background jobs started from the UI (disk listing, retries)
+    FILE_POLL_INTERVAL_MS = 3000  # How often settings.ini and handler_list.Json are checked for changes
+    FILE_EVENT_DEBOUNCE_MS = 200  # Quiet time after a watcher event before the files are re-read
+    ERROR_POLL_INTERVAL_MS = 500  # How often the queue of delivery errors reported by the bot is drained
+    TREE_BULK_INSERT_ROWS = 50  # Row inserts from which the users tree is hidden while it is filled
+    DELETE_CONFIRM_MAX_USERS = 50  # Users listed by name when confirming a program deletion
+    # ttk styling - minimal modern palette - applied in one Tcl eval by _setup_modern_style
+    _STYLE_SCRIPT = """
+        ttk::style configure TFrame -background #f5f5f5
+        ttk::style configure TLabelFrame -background #f5f5f5 -borderwidth 1 -relief solid
+        ttk::style configure TLabelFrame.Label -background #f5f5f5 -font {{Segoe UI} 9 bold}
+        
+        ttk::style configure TButton -padding {12 6} -font {{Segoe UI} 9} -borderwidth 1 -relief flat
+        ttk::style map TButton \\
+            -background {active #e0e0e0 !active #ffffff} \\
+            -relief {pressed sunken !pressed flat}
+        
+        ttk::style configure TEntry -padding 6 -font {{Segoe UI} 9} -borderwidth 1 -relief solid \\
+            -fieldbackground #ffffff
+        
+        ttk::style configure TLabel -background #f5f5f5 -font {{Segoe UI} 9} -foreground #333333
+        
+        ttk::style configure Treeview -background #ffffff -foreground #333333 \\
+            -fieldbackground #ffffff -font {{Segoe UI} 9} -rowheight 24
+        ttk::style configure Treeview.Heading -background #e8e8e8 -foreground #333333 \\
+            -font {{Segoe UI} 9 bold} -relief flat -borderwidth 1
+        ttk::style map Treeview \\
+            -background {selected #4a9eff} \\
+            -foreground {selected #ffffff}
+        
+        ttk::style configure TScrollbar -background #e0e0e0 -troughcolor #f5f5f5 -borderwidth 0 \\
+            -arrowcolor #666666 -darkcolor #e0e0e0 -lightcolor #e0e0e0
+    """
+    # Tcl lambda inserting a list of {parent index text values tags} rows into a treeview
+    _TREE_INSERT_LAMBDA = """{tree rows} {
+        set ids {}
+        foreach row $rows {
+            lassign $row parent index text values tags
+            lappend ids [$tree insert $parent $index -text $text -values $values -tags $tags]
+        }
+        return $ids
+    }"""
+    
     def __init__(self, root: tk.Tk):
         """Initialize the GUI."""
         self.root = root
         self.root.title("Настройки бота")
-        self.root.geometry("1000x750")
         self.root.minsize(800, 600)
         self.root.resizable(True, True)
         
         # Setup modern styling
         self._setup_modern_style()
         
-        # Center window on screen
+        # Size and center window on screen
         self._center_window()
         
         # Bot state
@@ -50,6 +155,9 @@ class BotSettingsGUI:
         self.bot_thread: Optional[threading.Thread] = None
         self.bot_running = False
         
+        # Background jobs started by buttons; reusing threads also bounds them on rapid clicks
+        self._executor = ThreadPoolExecutor(max_workers=self.BACKGROUND_WORKERS, thread_name_prefix='gui-bg')
+        
         # Settings file path
         self.settings_file = Path("settings.ini")
         self.handler_list_file = Path("handler_list.Json")
@@ -57,9 +165,13 @@ class BotSettingsGUI:
         # File monitoring for auto-refresh
         self.settings_file_mtime = 0
         self.handler_list_file_mtime = 0
-        self.file_poll_running = False
-        self.file_poll_thread = None
-        self.user_editing = False  # Flag to pause polling during edits
+        self._poll_after_id: Optional[str] = None  # Pending Tk after() callback of the file poll
+        self._file_observer = None  # watchdog Observer, when watchdog is installed
+        self._pending_refresh_id: Optional[str] = None  # Debounced refresh after watcher events
+        # (st_mtime_ns, parsed content) of the last read of each file, so unchanged files aren't reparsed;
+        # the handler list entry also keeps hash() of the file text, to catch touches without edits
+        self._settings_cache: Optional[tuple] = None
+        self._handler_cache: Optional[tuple] = None
         
         # Initialize logger
         self.logger = get_logger()
@@ -67,6 +179,9 @@ class BotSettingsGUI:
         
         # Load handler list data
         self.handler_data: Dict[str, Any] = {}
+        # program_key -> (begin_date, {username: name}) as displayed, rebuilt by _normalize_handler_data
+        self._normalized: Dict[str, tuple] = {}
+        self._username_index: Dict[str, str] = {}  # username -> program_key
         self._load_handler_list()
         self._update_file_mtimes()
         
@@ -93,66 +208,17 @@ class BotSettingsGUI:
         elif 'clam' in available_themes:
             style.theme_use('clam')
         
-        # Configure colors - minimal modern palette
-        style.configure('TFrame', background='#f5f5f5')
-        style.configure('TLabelFrame', background='#f5f5f5', borderwidth=1, relief='solid')
-        style.configure('TLabelFrame.Label', background='#f5f5f5', font=('Segoe UI', 9, 'bold'))
-        
-        # Modern button styling
-        style.configure('TButton', 
-                       padding=(12, 6),
-                       font=('Segoe UI', 9),
-                       borderwidth=1,
-                       relief='flat')
-        style.map('TButton',
-                 background=[('active', '#e0e0e0'), ('!active', '#ffffff')],
-                 relief=[('pressed', 'sunken'), ('!pressed', 'flat')])
-        
-        # Entry styling
-        style.configure('TEntry',
-                       padding=6,
-                       font=('Segoe UI', 9),
-                       borderwidth=1,
-                       relief='solid',
-                       fieldbackground='#ffffff')
-        
-        # Label styling
-        style.configure('TLabel',
-                       background='#f5f5f5',
-                       font=('Segoe UI', 9),
-                       foreground='#333333')
-        
-        # Treeview styling
-        style.configure('Treeview',
-                       background='#ffffff',
-                       foreground='#333333',
-                       fieldbackground='#ffffff',
-                       font=('Segoe UI', 9),
-                       rowheight=24)
-        style.configure('Treeview.Heading',
-                       background='#e8e8e8',
-                       foreground='#333333',
-                       font=('Segoe UI', 9, 'bold'),
-                       relief='flat',
-                       borderwidth=1)
-        style.map('Treeview',
-                 background=[('selected', '#4a9eff')],
-                 foreground=[('selected', '#ffffff')])
-        
-        # Scrollbar styling
-        style.configure('TScrollbar',
-                       background='#e0e0e0',
-                       troughcolor='#f5f5f5',
-                       borderwidth=0,
-                       arrowcolor='#666666',
-                       darkcolor='#e0e0e0',
-                       lightcolor='#e0e0e0')
+        # All configure/map calls go to Tcl as one script instead of one call each
+        self.root.tk.eval(self._STYLE_SCRIPT)
     
     def _center_window(self):
-        """Center the window on the screen."""
-        self.root.update_idletasks()
-        width = self.root.winfo_width()
-        height = self.root.winfo_height()
+        """
+        Give the window its initial size, centered on the screen.
+        
+        The size is fixed (WINDOW_SIZE), so it is used directly instead of forcing a layout
+        pass with update_idletasks() to read it back before any widget exists.
+        """
+        width, height = self.WINDOW_SIZE
         x = (self.root.winfo_screenwidth() // 2) - (width // 2)
         y = (self.root.winfo_screenheight() // 2) - (height // 2)
         self.root.geometry(f"{width}x{height}+{x}+{y}")
@@ -239,9 +305,10 @@ class BotSettingsGUI:
         buttons_frame = ttk.Frame(users_frame)
         buttons_frame.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=8)
         
-        ttk.Button(
+        self.load_programs_button = ttk.Button(
             buttons_frame, text="Загрузить программы с диска", command=self._load_programs_from_disk
-        ).pack(side=tk.LEFT, padx=6)
+        )
+        self.load_programs_button.pack(side=tk.LEFT, padx=6)
         
         ttk.Button(
             buttons_frame, text="Сохранить изменения", command=self._save_users
@@ -285,14 +352,31 @@ class BotSettingsGUI:
         # Bind right-click for context menu
         self.users_tree.bind("<Button-3>", self._on_tree_right_click)
         
+        # Track the selection, so right-clicks on the selected row don't re-select it
+        self.users_tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        
+        # User rows are only inserted when a program is expanded
+        self.users_tree.bind("<<TreeviewOpen>>", self._on_program_expand)
+        
         # Create context menu
         self.context_menu = tk.Menu(self.root, tearoff=0, font=('Segoe UI', 9))
         self.context_menu.add_command(label="Удалить", command=self._delete_selected_item)
         
         # Store program items for reference
         self.program_items = {}  # program_key -> tree item id
+        self._program_by_item = {}  # tree item id -> program_key, the reverse of program_items
         self.user_items = {}  # (program_key, username) -> tree item id
+        self.add_items = {}  # program_key -> tree item id of its "add user" row
+        self.lazy_items = {}  # program_key -> placeholder child shown until the program is expanded
+        self._program_loaded = set()  # programs whose user rows have been inserted
+        self._tree_values = {}  # tree item id -> values last shown, to skip unchanged rows
         self.selected_item = None
+        self._tree_selection = ()  # item ids selected in the users tree, as of the last <<TreeviewSelect>>
+        
+        # Configure tags with modern styling
+        self.users_tree.tag_configure("program", font=('Segoe UI', 10, 'bold'))
+        self.users_tree.tag_configure("user", font=('Segoe UI', 9))
+        self.users_tree.tag_configure("add_button", foreground="#0066cc", font=('Segoe UI', 9, 'italic'))
         
         self._refresh_users_tree()
     
@@ -313,6 +397,7 @@ class BotSettingsGUI:
         
         self.bot_status_label = ttk.Label(bot_frame, text="Статус: Остановлен")
         self.bot_status_label.pack(pady=6)
+        self._bot_status_shown: Optional[bool] = None  # running state the button and label last showed
         
         # Delivery time control
         time_frame = ttk.Frame(bot_frame)
@@ -343,43 +428,68 @@ class BotSettingsGUI:
         self.error_indicator_label.pack()
         self.error_indicator_label.bind("<Button-1>", self._on_error_indicator_click)
         
-        # Store current errors
+        # Store current errors; the bot's scheduler pushes new ones into error_queue
         self.current_errors = []
-        self.error_poll_thread = None
-        self.error_poll_running = False
+        self._error_users: Counter = Counter()  # username -> number of entries in current_errors
+        self.error_queue: queue.Queue = queue.Queue()
+        self._error_after_id: Optional[str] = None  # Pending Tk after() callback of the error poll
+        self._error_indicator_shown = ("", "red")  # (text, foreground) currently on the indicator
     
     def _load_settings(self):
         """Load settings from settings.ini file."""
-        if not self.settings_file.exists():
-            return
-        
         try:
-            self.user_editing = True
-            config = configparser.ConfigParser()
-            config.read(self.settings_file, encoding='utf-8')
-            
-            if 'tokens' in config:
-                self.bot_token_var.set(config['tokens'].get('bot_token', ''))
-                self.disk_token_var.set(config['tokens'].get('disk_token', ''))
-            
-            # Load delivery time
-            if 'scheduler' in config:
-                delivery_time = config['scheduler'].get('delivery_time', '09:00')
-                self.delivery_time_var.set(delivery_time)
+            config = self._get_settings_config()
+            if config is None:
+                return
             
+            self._apply_settings(config)
             self._update_file_mtimes()
-            self.user_editing = False
         except Exception as e:
-            self.user_editing = False
             messagebox.showerror("Ошибка", f"Не удалось загрузить настройки: {str(e)}")
     
+    def _get_settings_config(self) -> Optional[configparser.ConfigParser]:
+        """
+        Return the parsed settings.ini, reparsing it only when its mtime changed.
+        
+        Returns:
+            Parsed config, or None if the file doesn't exist.
+        """
+        try:
+            mtime = os.stat(self.settings_file).st_mtime_ns
+        except OSError:
+            return None
+        
+        if self._settings_cache is None or self._settings_cache[0] != mtime:
+            config = self._new_settings_config()
+            config.read(self.settings_file, encoding='utf-8')
+            self._settings_cache = (mtime, config)
+        return self._settings_cache[1]
+    
+    @staticmethod
+    def _new_settings_config() -> configparser.ConfigParser:
+        """
+        Create an empty parser for settings.ini.
+        
+        The file only holds plain values (tokens, a time), so interpolation is turned off:
+        reads skip the '%' expansion pass, and a token containing '%' can be saved and read back.
+        """
+        return configparser.ConfigParser(interpolation=None)
+    
+    def _apply_settings(self, config: configparser.ConfigParser):
+        """Show the values from a parsed settings.ini in the form."""
+        if 'tokens' in config:
+            self.bot_token_var.set(config['tokens'].get('bot_token', ''))
+            self.disk_token_var.set(config['tokens'].get('disk_token', ''))
+        
+        # Load delivery time
+        if 'scheduler' in config:
+            delivery_time = config['scheduler'].get('delivery_time', '09:00')
+            self.delivery_time_var.set(delivery_time)
+    
     def _save_settings(self):
         """Save settings to settings.ini file."""
         try:
-            self.user_editing = True
-            config = configparser.ConfigParser()
-            if self.settings_file.exists():
-                config.read(self.settings_file, encoding='utf-8')
+            config = self._get_settings_config() or self._new_settings_config()
             
             if 'tokens' not in config:
                 config.add_section('tokens')
@@ -393,125 +503,286 @@ class BotSettingsGUI:
             
             config['scheduler']['delivery_time'] = self.delivery_time_var.get()
             
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                config.write(f)
-            
-            self._update_file_mtimes()
-            self.user_editing = False
+            self._write_settings_config(config)
             self.logger.info("Settings saved successfully")
             messagebox.showinfo("Успех", "Настройки сохранены")
         except Exception as e:
-            self.user_editing = False
             self.logger.error(f"Failed to save settings: {str(e)}", exc_info=True)
             messagebox.showerror("Ошибка", f"Не удалось сохранить настройки: {str(e)}")
     
-    def _load_handler_list(self):
-        """Load handler_list.Json file."""
-        if not self.handler_list_file.exists():
+    def _write_settings_config(self, config: configparser.ConfigParser):
+        """
+        Write a (possibly cached and modified) parser to settings.ini.
+        
+        The written parser stays cached under the new mtime, so the next save or
+        refresh doesn't parse the file again.
+        """
+        # The parser may already hold unsaved changes; don't let a failed write leave them cached
+        self._settings_cache = None
+        with open(self.settings_file, 'w', encoding='utf-8') as f:
+            config.write(f)
+        
+        self._update_file_mtimes()
+        self._settings_cache = (self.settings_file_mtime, config)
+    
+    def _load_handler_list(self, force: bool = True) -> bool:
+        """
+        Load handler_list.Json file.
+        
+        Args:
+            force: Reload even if the file hasn't changed since the last load. Without it,
+                   an unchanged file (same mtime, or same text under a new mtime) keeps the
+                   current (possibly edited) handler_data.
+        
+        Returns:
+            True if handler_data was replaced, False if it was kept.
+        """
+        # Write the running bot's pending user updates first, so they are read here
+        # and not overwritten by the next _save_handler_list
+        if self.bot_running and self.bot_instance:
+            try:
+                self.bot_instance.user_manager.flush()
+            except Exception as e:
+                print(f"Failed to flush bot user data: {str(e)}")
+        
+        try:
+            mtime = os.stat(self.handler_list_file).st_mtime_ns
+        except OSError:
             self.handler_data = {}
-            return
+            self._handler_cache = None
+            self._normalize_handler_data()
+            return True
+        
+        if not force and self._handler_cache is not None and self._handler_cache[0] == mtime:
+            return False
         
         try:
             with open(self.handler_list_file, 'r', encoding='utf-8') as f:
-                self.handler_data = json.load(f)
+                text = f.read()
+            text_hash = hash(text)
+            if not force and self._handler_cache is not None and self._handler_cache[1] == text_hash:
+                # Touched or re-saved without changes: nothing to reparse or redraw
+                self._handler_cache = (mtime, text_hash, self._handler_cache[2])
+                return False
+            
+            self.handler_data = json.loads(text)
+            self._handler_cache = (mtime, text_hash, self.handler_data)
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось загрузить список пользователей: {str(e)}")
             self.handler_data = {}
+            self._handler_cache = None
+        self._normalize_handler_data()
+        return True
+    
+    def _normalize_handler_data(self):
+        """
+        Rebuild the display structure of handler_data.
+        
+        Called whenever handler_data is loaded or edited, so _refresh_users_tree only walks
+        the prepared per-program user lists instead of re-filtering every program's keys.
+        """
+        normalized = {}
+        username_index = {}
+        for program_key, program_data in self.handler_data.items():
+            # Skip metadata entries such as "_schema_version"
+            if not isinstance(program_data, dict):
+                continue
+            
+            users = {}
+            for key, value in program_data.items():
+                if key == 'begin_date' or not key.startswith('@'):
+                    continue
+                
+                users[key] = self._display_name(value)
+                username_index.setdefault(key, program_key)
+            
+            normalized[program_key] = (program_data.get('begin_date', ''), users)
+        self._normalized = normalized
+        self._username_index = username_index
+    
+    @staticmethod
+    def _display_name(value: Any) -> str:
+        """Return the name shown for a user entry of handler_data."""
+        # Handle both old format (string) and new format (dict)
+        if isinstance(value, dict):
+            # Use 'name' field instead of 'email'; chat_id is stored but not displayed in UI
+            name = value.get('name')
+        else:
+            # Old format - treat as name
+            name = value
+        return name if name else "(имя не указано)"
     
     def _save_handler_list(self):
         """Save handler_list.Json file."""
         try:
-            self.user_editing = True
-            with open(self.handler_list_file, 'w', encoding='utf-8') as f:
-                json.dump(self.handler_data, f, indent=4, ensure_ascii=False)
+            # Serialize in one call and swap the file in atomically, like UserManager does,
+            # so the running bot never reads a half-written list. The temp file is unique per
+            # write: the bot's save timer may be writing its own one at the same time
+            payload = json.dumps(self.handler_data, indent=4, ensure_ascii=False)
+            fd, tmp_name = tempfile.mkstemp(
+                dir=self.handler_list_file.parent, prefix=self.handler_list_file.name, suffix='.tmp'
+            )
+            tmp_path = Path(tmp_name)
+            try:
+                with open(fd, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(tmp_path, self.handler_list_file)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
             self._update_file_mtimes()
-            self.user_editing = False
+            # The file now matches handler_data, so an unrelated refresh needn't reparse it
+            self._handler_cache = (self.handler_list_file_mtime, hash(payload), self.handler_data)
             return True
         except Exception as e:
-            self.user_editing = False
             messagebox.showerror("Ошибка", f"Не удалось сохранить список пользователей: {str(e)}")
             return False
     
     def _update_file_mtimes(self):
         """Update file modification time tracking."""
-        try:
-            if self.settings_file.exists():
-                self.settings_file_mtime = os.path.getmtime(self.settings_file)
-            if self.handler_list_file.exists():
-                self.handler_list_file_mtime = os.path.getmtime(self.handler_list_file)
-        except Exception:
-            pass
+        for attr, mtime in self._read_file_mtimes().items():
+            setattr(self, attr, mtime)
+    
+    def _watched_files(self):
+        """Return (path, mtime attribute name) pairs for the files polled for changes."""
+        return (
+            (self.settings_file, 'settings_file_mtime'),
+            (self.handler_list_file, 'handler_list_file_mtime'),
+        )
+    
+    def _read_file_mtimes(self) -> Dict[str, int]:
+        """
+        Read the current mtimes of the watched files.
+        
+        The files live side by side, so their directory is listed once with os.scandir
+        instead of stat()ing each path; on Windows the listing already carries the stat
+        data, so this is a single directory read per poll.
+        
+        Returns:
+            Mtime attribute name -> st_mtime_ns. Missing files are left out.
+        """
+        # directory -> {normalized file name: mtime attribute name}
+        directories: Dict[str, Dict[str, str]] = {}
+        for path, attr in self._watched_files():
+            directories.setdefault(str(path.parent), {})[os.path.normcase(path.name)] = attr
+        
+        mtimes = {}
+        for directory, names in directories.items():
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        attr = names.get(os.path.normcase(entry.name))
+                        if attr is None:
+                            continue
+                        try:
+                            mtimes[attr] = entry.stat().st_mtime_ns
+                        except OSError:
+                            pass
+            except OSError:
+                continue
+        return mtimes
     
     def _check_files_changed(self) -> bool:
-        """Check if files have changed externally. Returns True if changed."""
-        if self.user_editing:
-            return False
-        
-        try:
-            changed = False
-            if self.settings_file.exists():
-                current_mtime = os.path.getmtime(self.settings_file)
-                if current_mtime != self.settings_file_mtime:
-                    self.settings_file_mtime = current_mtime
-                    changed = True
-            
-            if self.handler_list_file.exists():
-                current_mtime = os.path.getmtime(self.handler_list_file)
-                if current_mtime != self.handler_list_file_mtime:
-                    self.handler_list_file_mtime = current_mtime
-                    changed = True
-            
-            return changed
-        except Exception:
-            return False
+        """
+        Check if files have changed externally. Returns True if changed.
+        
+        Runs on the Tk thread only, like every write of these files, so a save and its
+        mtime update can't interleave with a check.
+        """
+        changed = False
+        # A missing file simply doesn't count as a change
+        for attr, current_mtime in self._read_file_mtimes().items():
+            if current_mtime != getattr(self, attr):
+                setattr(self, attr, current_mtime)
+                changed = True
+        
+        return changed
     
     def _start_file_polling(self):
-        """Start polling files for changes."""
-        if self.file_poll_running:
+        """Start watching files for changes (OS notifications if watchdog is available, else polling)."""
+        if self._poll_after_id is not None or self._file_observer is not None:
             return
         
-        self.file_poll_running = True
-        
-        def poll_files():
-            while self.file_poll_running:
-                try:
-                    if self._check_files_changed():
-                        # Update UI in main thread
-                        self.root.after(0, self._auto_refresh_files)
-                    time.sleep(3)  # Poll every 3 seconds
-                except Exception as e:
-                    print(f"File polling error: {str(e)}")
-                    time.sleep(3)
+        if Observer is not None:
+            try:
+                handler = _WatchedFilesHandler(
+                    (self.settings_file.name, self.handler_list_file.name),
+                    self._on_watched_file_event
+                )
+                observer = Observer()
+                observer.daemon = True
+                observer.schedule(handler, str(self.settings_file.resolve().parent), recursive=False)
+                if self.handler_list_file.resolve().parent != self.settings_file.resolve().parent:
+                    observer.schedule(handler, str(self.handler_list_file.resolve().parent), recursive=False)
+                observer.start()
+                self._file_observer = observer
+                return
+            except Exception as e:
+                self.logger.warning("File watcher unavailable, polling instead: %s", e)
         
-        self.file_poll_thread = threading.Thread(target=poll_files, daemon=True)
-        self.file_poll_thread.start()
+        self._poll_after_id = self.root.after(self.FILE_POLL_INTERVAL_MS, self._poll_files_tick)
+    
+    def _on_watched_file_event(self):
+        """Called on the watchdog thread; hands the event over to the Tk thread."""
+        try:
+            self.root.after(0, self._schedule_file_refresh)
+        except RuntimeError:
+            # The window is already gone
+            pass
+    
+    def _schedule_file_refresh(self):
+        """
+        Debounce watcher events (runs on the Tk thread).
+        
+        A single save usually fires several events (truncate, write, close, rename); each
+        one pushes the check back, so the burst ends in one re-read of the files.
+        """
+        if self._pending_refresh_id is not None:
+            self.root.after_cancel(self._pending_refresh_id)
+        self._pending_refresh_id = self.root.after(self.FILE_EVENT_DEBOUNCE_MS, self._run_pending_refresh)
+    
+    def _run_pending_refresh(self):
+        """Run the debounced refresh scheduled by _schedule_file_refresh."""
+        self._pending_refresh_id = None
+        self._refresh_if_files_changed()
+    
+    def _refresh_if_files_changed(self):
+        """Reload the UI from the files if they changed externally (runs on the Tk thread)."""
+        try:
+            if self._check_files_changed():
+                self._auto_refresh_files()
+        except Exception as e:
+            print(f"File polling error: {str(e)}")
+    
+    def _poll_files_tick(self):
+        """Check the files for external changes and schedule the next check (runs on the Tk thread)."""
+        self._refresh_if_files_changed()
+        self._poll_after_id = self.root.after(self.FILE_POLL_INTERVAL_MS, self._poll_files_tick)
     
     def _stop_file_polling(self):
         """Stop file polling."""
-        self.file_poll_running = False
+        if self._file_observer is not None:
+            self._file_observer.stop()
+            self._file_observer = None
+        if self._poll_after_id is not None:
+            self.root.after_cancel(self._poll_after_id)
+            self._poll_after_id = None
+        if self._pending_refresh_id is not None:
+            self.root.after_cancel(self._pending_refresh_id)
+            self._pending_refresh_id = None
     
     def _auto_refresh_files(self):
         """Auto-refresh files when external changes detected."""
-        if self.user_editing:
-            return
-        
         try:
-            # Reload settings
-            if self.settings_file.exists():
-                config = configparser.ConfigParser()
-                config.read(self.settings_file, encoding='utf-8')
-                
-                if 'tokens' in config:
-                    self.bot_token_var.set(config['tokens'].get('bot_token', ''))
-                    self.disk_token_var.set(config['tokens'].get('disk_token', ''))
-                
-                if 'scheduler' in config:
-                    delivery_time = config['scheduler'].get('delivery_time', '09:00')
-                    self.delivery_time_var.set(delivery_time)
+            # Reload settings (only reparsed and re-applied if settings.ini itself changed)
+            previous_settings = self._settings_cache
+            config = self._get_settings_config()
+            if config is not None and self._settings_cache is not previous_settings:
+                self._apply_settings(config)
             
-            # Reload handler list
-            self._load_handler_list()
-            self._refresh_users_tree()
+            # Reload handler list (only if handler_list.Json itself changed)
+            if self._load_handler_list(force=False):
+                self._refresh_users_tree()
             
             # Show subtle notification (optional - can be removed if too intrusive)
             # Could add a status bar message here if desired
@@ -526,67 +797,226 @@ class BotSettingsGUI:
         messagebox.showinfo("Обновлено", "Данные обновлены из файлов")
     
     def _refresh_users_tree(self):
-        """Refresh the users tree display."""
-        # Clear existing items
-        for item in self.users_tree.get_children():
-            self.users_tree.delete(item)
-        
-        self.program_items = {}
-        self.user_items = {}
-        
-        if not self.handler_data:
-            return
+        """
+        Refresh the users tree display.
+        
+        The tree is diffed against the normalized handler_data: only rows for added or removed programs
+        and users are inserted or deleted, and existing rows are updated only when their
+        values changed, so selection and scroll position survive a refresh. User rows are
+        only created for programs that have been expanded (see _on_program_expand).
+        """
+        tree = self.users_tree
+        
+        # Built from handler_data on load and after each edit, not on every refresh
+        wanted = self._normalized
+        
+        # Remove rows that are no longer in the data
+        for program_key in [key for key in self.program_items if key not in wanted]:
+            program_item = self.program_items.pop(program_key)
+            self._tree_values.pop(program_item, None)
+            self._program_by_item.pop(program_item, None)
+            tree.delete(program_item)
+            self.add_items.pop(program_key, None)
+            self.lazy_items.pop(program_key, None)
+            self._program_loaded.discard(program_key)
+        for user_key in [key for key in self.user_items if key[1] not in wanted.get(key[0], ("", {}))[1]]:
+            user_item = self.user_items.pop(user_key)
+            self._tree_values.pop(user_item, None)
+            if tree.exists(user_item):
+                tree.delete(user_item)
+        
+        # Many inserts (e.g. the first population) are done with the tree taken out of the
+        # grid, so Tk lays it out once when it is shown again instead of as rows arrive
+        pending_inserts = sum(
+            (program_key not in self.program_items) * 2
+            + (program_key in self._program_loaded)
+            * sum((program_key, username) not in self.user_items for username in users)
+            for program_key, (_, users) in wanted.items()
+        )
+        detached = pending_inserts >= self.TREE_BULK_INSERT_ROWS
+        if detached:
+            tree.grid_remove()
         
-        for program_key, program_data in self.handler_data.items():
-            begin_date = program_data.get('begin_date', '')
-            
-            # Create program item
-            program_item = self.users_tree.insert(
-                "",
-                "end",
-                text=f"📁 {program_key}",
-                values=("", begin_date),
-                tags=("program",)
-            )
+        try:
+            self._apply_tree_rows(wanted)
+        finally:
+            if detached:
+                tree.grid()
+    
+    def _apply_tree_rows(self, wanted: Dict[str, tuple]):
+        """
+        Insert missing rows and update changed ones, in handler_data order.
+        
+        New rows are inserted in two batches (programs, then their children), each sent
+        to Tk as a single Tcl call.
+        
+        Args:
+            wanted: program_key -> (begin_date, {username: name}) as built by _normalize_handler_data
+        """
+        # Programs first, since their children need the new item ids
+        new_programs = []
+        program_rows = []
+        for program_index, (program_key, (begin_date, users)) in enumerate(wanted.items()):
+            program_item = self.program_items.get(program_key)
+            if program_item is None:
+                new_programs.append(program_key)
+                program_rows.append(("", program_index, _PROGRAM_PREFIX + program_key, ("", begin_date), _PROGRAM_TAGS))
+            else:
+                self._set_tree_values(program_item, ("", begin_date))
+        for program_key, row, program_item in zip(new_programs, program_rows, self._insert_tree_rows(program_rows)):
             self.program_items[program_key] = program_item
+            self._program_by_item[program_item] = program_key
+            self._tree_values[program_item] = row[3]
+        
+        # Children: placeholder, "+" row and users; each entry of child_keys says where
+        # the id of the matching row goes
+        child_rows = []
+        child_keys = []
+        for program_key, (begin_date, users) in wanted.items():
+            program_item = self.program_items[program_key]
             
-            # Add users under program
-            for key, value in program_data.items():
-                if key == 'begin_date' or not key.startswith('@'):
-                    continue
-                
-                username = key
-                # Handle both old format (string) and new format (dict)
-                if isinstance(value, dict):
-                    # Use 'name' field instead of 'email'
-                    name = value.get('name', '') if value.get('name') else "(имя не указано)"
-                    # chat_id is stored but not displayed in UI
-                else:
-                    # Old format - treat as name
-                    name = value if value else "(имя не указано)"
-                
-                user_item = self.users_tree.insert(
-                    program_item,
-                    "end",
-                    text=username,
-                    values=(name, ""),
-                    tags=("user",)
-                )
-                self.user_items[(program_key, username)] = user_item
+            if program_key not in self._program_loaded:
+                # Placeholder child, so the program shows an expand arrow
+                if program_key not in self.lazy_items:
+                    child_rows.append((program_item, "end", "", _EMPTY_VALUES, _LAZY_TAGS))
+                    child_keys.append((self.lazy_items, program_key))
+                continue
             
-            # Add "+" button item for adding users
-            add_item = self.users_tree.insert(
-                program_item,
-                "end",
-                text="➕ Добавить пользователя",
-                values=("", ""),
-                tags=("add_button",)
+            if program_key not in self.add_items:
+                # Add "+" button item for adding users
+                child_rows.append((program_item, "end", "➕ Добавить пользователя", _EMPTY_VALUES, _ADD_TAGS))
+                child_keys.append((self.add_items, program_key))
+            
+            # Add users under program (always above the "+" row)
+            for user_index, (username, name) in enumerate(users.items()):
+                user_item = self.user_items.get((program_key, username))
+                if user_item is None:
+                    child_rows.append((program_item, user_index, username, (name, ""), _USER_TAGS))
+                    child_keys.append((self.user_items, (program_key, username)))
+                else:
+                    self._set_tree_values(user_item, (name, ""))
+        for (items, key), row, item in zip(child_keys, child_rows, self._insert_tree_rows(child_rows)):
+            items[key] = item
+            if items is self.user_items:
+                self._tree_values[item] = row[3]
+    
+    def _insert_tree_rows(self, rows: List[tuple]) -> List[str]:
+        """
+        Insert rows into the users tree with a single Tcl call.
+        
+        Args:
+            rows: (parent, index, text, values, tags) tuples, inserted in order.
+        
+        Returns:
+            Item ids of the inserted rows, in the same order.
+        """
+        if not rows:
+            return []
+        
+        tree = self.users_tree
+        # tkinter passes the (nested) tuples as proper Tcl lists, so no manual quoting is needed
+        result = tree.tk.call('apply', self._TREE_INSERT_LAMBDA, str(tree), tuple(rows))
+        return list(tree.tk.splitlist(result))
+    
+    def _on_program_expand(self, event):
+        """Insert a program's user rows the first time it is expanded."""
+        item = self.users_tree.focus()
+        program_key = self._program_by_item.get(item)
+        if program_key is None or program_key in self._program_loaded:
+            return
+        
+        self._program_loaded.add(program_key)
+        placeholder = self.lazy_items.pop(program_key, None)
+        if placeholder is not None:
+            self.users_tree.delete(placeholder)
+        self._refresh_users_tree()
+    
+    def _program_key(self, item: str) -> str:
+        """Return the program key of a program row."""
+        program_key = self._program_by_item.get(item)
+        if program_key is None:
+            # Not a row we inserted; fall back to the label
+            program_key = self.users_tree.item(item, "text")[len(_PROGRAM_PREFIX):]
+        return program_key
+    
+    def _set_tree_values(self, item: str, values: tuple):
+        """Update a tree row's values, skipping the Tk call when nothing changed."""
+        if self._tree_values.get(item) != values:
+            self.users_tree.item(item, values=values)
+            self._tree_values[item] = values
+    
+    def _tree_update_user(self, program_key: str, username: str):
+        """
+        Show an added or edited user of handler_data without a full tree refresh.
+        
+        Updates the normalized data and the username index, then the user's row: its
+        values if it exists, a new row if the program's users are already shown.
+        """
+        if program_key not in self._normalized or program_key not in self.program_items:
+            self._normalize_handler_data()
+            self._refresh_users_tree()
+            return
+        
+        name = self._display_name(self.handler_data[program_key][username])
+        users = self._normalized[program_key][1]
+        # New users are appended to handler_data, so they also go last here
+        users[username] = name
+        self._username_index.setdefault(username, program_key)
+        
+        user_item = self.user_items.get((program_key, username))
+        if user_item is not None:
+            self._set_tree_values(user_item, (name, ""))
+        elif program_key in self._program_loaded:
+            values = (name, "")
+            # Users sit above the "+" row, in handler_data order
+            user_item = self.users_tree.insert(
+                self.program_items[program_key], len(users) - 1,
+                text=username, values=values, tags=_USER_TAGS
             )
+            self.user_items[(program_key, username)] = user_item
+            self._tree_values[user_item] = values
+    
+    def _tree_remove_user(self, program_key: str, username: str):
+        """Drop a user removed from handler_data from the normalized data and the tree."""
+        if program_key in self._normalized:
+            self._normalized[program_key][1].pop(username, None)
+        self._reindex_username(username, program_key)
+        
+        user_item = self.user_items.pop((program_key, username), None)
+        if user_item is not None:
+            self._tree_values.pop(user_item, None)
+            self.users_tree.delete(user_item)
+    
+    def _tree_remove_program(self, program_key: str):
+        """Drop a program removed from handler_data, with its users, from the normalized data and the tree."""
+        _, users = self._normalized.pop(program_key, ("", {}))
+        for username in users:
+            self._reindex_username(username, program_key)
+            user_item = self.user_items.pop((program_key, username), None)
+            if user_item is not None:
+                self._tree_values.pop(user_item, None)
+        
+        self.add_items.pop(program_key, None)
+        self.lazy_items.pop(program_key, None)
+        self._program_loaded.discard(program_key)
+        program_item = self.program_items.pop(program_key, None)
+        if program_item is not None:
+            self._tree_values.pop(program_item, None)
+            self._program_by_item.pop(program_item, None)
+            # Deleting the program row deletes its children too
+            self.users_tree.delete(program_item)
+    
+    def _reindex_username(self, username: str, program_key: str):
+        """Point the username index away from program_key after the user left it."""
+        if self._username_index.get(username) != program_key:
+            return
         
-        # Configure tags with modern styling
-        self.users_tree.tag_configure("program", font=('Segoe UI', 10, 'bold'))
-        self.users_tree.tag_configure("user", font=('Segoe UI', 9))
-        self.users_tree.tag_configure("add_button", foreground="#0066cc", font=('Segoe UI', 9, 'italic'))
+        # Same username in another program (only possible in hand-edited files)
+        other = next((key for key, (_, users) in self._normalized.items() if username in users), None)
+        if other is None:
+            del self._username_index[username]
+        else:
+            self._username_index[username] = other
     
     def _load_programs_from_disk(self):
         """Load programs (folders) from Yandex Disk root."""
@@ -596,8 +1026,14 @@ class BotSettingsGUI:
             messagebox.showerror("Ошибка", "Токен Яндекс.Диска не указан")
             return
         
+        # The listing is a network request; run it off the Tk thread so the window stays responsive
+        self.load_programs_button.config(state=tk.DISABLED)
+        self._executor.submit(self._load_programs_worker, disk_token)
+    
+    def _load_programs_worker(self, disk_token: str):
+        """List program folders on the disk (worker thread) and hand the result to the Tk thread."""
         try:
-            handler = YandexDiskHandler(token=disk_token)
+            handler = get_shared_handler(token=disk_token)
             root_items = handler.list_directory("/")
             
             # Find all directories (programs)
@@ -608,7 +1044,26 @@ class BotSettingsGUI:
                     # Skip system folders if needed
                     if folder_name and not folder_name.startswith('.'):
                         programs.append(folder_name)
-            
+            result = programs
+        except Exception as e:
+            result = e
+        
+        self.root.after(0, self._load_programs_done, result)
+    
+    def _load_programs_done(self, result):
+        """
+        Add the listed programs to handler_data (runs on the Tk thread).
+        
+        Args:
+            result: List of program folder names, or the exception raised while listing.
+        """
+        self.load_programs_button.config(state=tk.NORMAL)
+        if isinstance(result, Exception):
+            messagebox.showerror("Ошибка", f"Не удалось загрузить программы с диска: {str(result)}")
+            return
+        
+        programs = result
+        try:
             if not programs:
                 messagebox.showinfo("Информация", "На диске не найдено папок программ")
                 return
@@ -630,6 +1085,7 @@ class BotSettingsGUI:
                     if begin_date:
                         self.handler_data[program]['begin_date'] = begin_date
             
+            self._normalize_handler_data()
             self._refresh_users_tree()
             if new_programs:
                 messagebox.showinfo("Успех", f"Добавлено {len(new_programs)} новых программ с диска")
@@ -649,7 +1105,8 @@ class BotSettingsGUI:
     
     def _on_tree_double_click(self, event):
         """Handle double-click on tree items."""
-        item = self.users_tree.selection()[0] if self.users_tree.selection() else None
+        selection = self.users_tree.selection()
+        item = selection[0] if selection else None
         if not item:
             return
         
@@ -658,10 +1115,7 @@ class BotSettingsGUI:
             # Add user to this program
             parent = self.users_tree.parent(item)
             if parent:
-                program_text = self.users_tree.item(parent, "text")
-                # Extract program name (remove folder icon)
-                program_key = program_text.replace("📁 ", "").strip()
-                self._add_user_to_program(program_key)
+                self._add_user_to_program(self._program_key(parent))
         elif "user" in tags:
             # Edit user name
             self._edit_user_name(item)
@@ -731,14 +1185,14 @@ class BotSettingsGUI:
         if not username.startswith('@'):
             username = '@' + username
         
-        # Check if user already exists
-        for prog_key, prog_data in self.handler_data.items():
-            if username in prog_data:
-                messagebox.showwarning(
-                    "Предупреждение",
-                    f"Пользователь {username} уже существует в программе {prog_key}"
-                )
-                return
+        # Check if user already exists (the index follows each change to handler_data)
+        prog_key = self._username_index.get(username)
+        if prog_key is not None:
+            messagebox.showwarning(
+                "Предупреждение",
+                f"Пользователь {username} уже существует в программе {prog_key}"
+            )
+            return
         
         name = ""
         if name_var:
@@ -751,26 +1205,20 @@ class BotSettingsGUI:
             'last_message_date': None
         }
         popup.destroy()
-        self._refresh_users_tree()
+        self._tree_update_user(program_key, username)
     
     def _edit_user_name(self, item):
         """Edit user name inline."""
         username = self.users_tree.item(item, "text")
-        parent = self.users_tree.parent(item)
-        program_text = self.users_tree.item(parent, "text")
-        program_key = program_text.replace("📁 ", "").strip()
+        program_key = self._program_key(self.users_tree.parent(item))
         
         # Get current name (handle both old and new format)
         user_data = self.handler_data[program_key].get(username, "")
         if isinstance(user_data, dict):
             current_name = user_data.get('name', '')
-            current_chat_id = user_data.get('chat_id')
-            current_last_message_date = user_data.get('last_message_date')
         else:
             # Old format
             current_name = user_data if user_data else ''
-            current_chat_id = None
-            current_last_message_date = None
         
         new_name = self._show_modal_dialog(
             "Изменить имя",
@@ -778,19 +1226,27 @@ class BotSettingsGUI:
             initialvalue=current_name
         )
         
-        if new_name is not None:
+        if new_name is None:
+            return
+        
+        new_name = new_name if new_name else ''
+        if isinstance(user_data, dict):
+            if new_name == (user_data.get('name') or ''):
+                return
+            # Update in place, like UserManager does, keeping chat_id and any other fields
+            user_data['name'] = new_name
+        else:
             # Save in new format
             self.handler_data[program_key][username] = {
-                'name': new_name if new_name else '',
-                'chat_id': current_chat_id,
-                'last_message_date': current_last_message_date
+                'name': new_name,
+                'chat_id': None,
+                'last_message_date': None
             }
-            self._refresh_users_tree()
+        self._tree_update_user(program_key, username)
     
     def _edit_program_date(self, item):
         """Edit program begin_date."""
-        program_text = self.users_tree.item(item, "text")
-        program_key = program_text.replace("📁 ", "").strip()
+        program_key = self._program_key(item)
         
         current_date = self.handler_data[program_key].get('begin_date', '')
         
@@ -802,13 +1258,18 @@ class BotSettingsGUI:
         
         if new_date is not None:
             self.handler_data[program_key]['begin_date'] = new_date
-            self._refresh_users_tree()
+            if program_key in self._normalized:
+                self._normalized[program_key] = (new_date, self._normalized[program_key][1])
+            self._set_tree_values(item, ("", new_date))
     
     def _on_tree_right_click(self, event):
         """Handle right-click on tree items."""
         item = self.users_tree.identify_row(event.y)
         if item:
-            self.users_tree.selection_set(item)
+            # selection_set fires <<TreeviewSelect>> and redraws, so skip it if nothing changes
+            if self._tree_selection != (item,):
+                self.users_tree.selection_set(item)
+                self._tree_selection = (item,)
             self.selected_item = item
             
             tags = self.users_tree.item(item, "tags")
@@ -816,6 +1277,10 @@ class BotSettingsGUI:
                 # Show context menu for users and programs
                 self.context_menu.post(event.x_root, event.y_root)
     
+    def _on_tree_select(self, event):
+        """Remember the users tree selection."""
+        self._tree_selection = self.users_tree.selection()
+    
     def _delete_selected_item(self):
         """Delete the selected item from tree."""
         if not self.selected_item:
@@ -826,24 +1291,16 @@ class BotSettingsGUI:
         
         if "user" in tags:
             username = self.users_tree.item(item, "text")
-            parent = self.users_tree.parent(item)
-            program_text = self.users_tree.item(parent, "text")
-            program_key = program_text.replace("📁 ", "").strip()
-            
-            self._remove_user(program_key, username)
+            self._remove_user(self._program_key(self.users_tree.parent(item)), username)
         elif "program" in tags:
-            program_text = self.users_tree.item(item, "text")
-            program_key = program_text.replace("📁 ", "").strip()
-            self._delete_program(program_key)
+            self._delete_program(self._program_key(item))
         
         self.selected_item = None
     
     def _remove_user(self, program_key: str, username: str):
         """Remove a user from a program."""
-        if program_key not in self.handler_data:
-            return
-        
-        if username not in self.handler_data[program_key]:
+        program_data = self.handler_data.get(program_key)
+        if program_data is None or username not in program_data:
             return
         
         # Confirm deletion
@@ -851,26 +1308,28 @@ class BotSettingsGUI:
             "Подтверждение",
             f"Удалить пользователя {username} из программы {program_key}?"
         ):
-            del self.handler_data[program_key][username]
-            self._refresh_users_tree()
+            program_data.pop(username, None)
+            self._tree_remove_user(program_key, username)
     
     def _delete_program(self, program_key: str):
         """Delete a program and all its users."""
         if program_key not in self.handler_data:
             return
         
-        # Get all users in the program
-        users_in_program = []
-        for key, value in self.handler_data[program_key].items():
-            if key.startswith('@'):
-                users_in_program.append(key)
+        # Get all users in the program (kept up to date in the normalized data)
+        users_in_program = self._normalized.get(program_key, ("", {}))[1]
+        user_count = len(users_in_program)
         
-        # Build confirmation message
+        # Build confirmation message; a message box can't usefully show thousands of lines
         if users_in_program:
-            user_list = '\n'.join(f"  - {user}" for user in users_in_program)
+            user_list = '\n'.join(
+                f"  - {user}" for user in islice(users_in_program, self.DELETE_CONFIRM_MAX_USERS)
+            )
+            if user_count > self.DELETE_CONFIRM_MAX_USERS:
+                user_list += f"\n  ... и ещё {user_count - self.DELETE_CONFIRM_MAX_USERS}"
             message = (
                 f"Удалить программу '{program_key}'?\n\n"
-                f"Это также удалит всех пользователей в программе ({len(users_in_program)}):\n"
+                f"Это также удалит всех пользователей в программе ({user_count}):\n"
                 f"{user_list}\n\n"
                 "Вы уверены?"
             )
@@ -879,8 +1338,8 @@ class BotSettingsGUI:
         
         # Confirm deletion
         if messagebox.askyesno("Подтверждение удаления программы", message):
-            del self.handler_data[program_key]
-            self._refresh_users_tree()
+            self.handler_data.pop(program_key, None)
+            self._tree_remove_program(program_key)
     
     def _save_users(self):
         """Save users to handler_list.Json."""
@@ -912,24 +1371,18 @@ class BotSettingsGUI:
         try:
             # Get delivery time from settings
             delivery_time_str = self.delivery_time_var.get().strip()
-            from datetime import time as dt_time
             try:
-                parts = delivery_time_str.split(':')
-                if len(parts) != 2:
-                    raise ValueError("Invalid format")
-                hour = int(parts[0])
-                minute = int(parts[1])
-                if hour < 0 or hour > 23 or minute < 0 or minute > 59:
-                    raise ValueError("Invalid time range")
-                initial_delivery_time = dt_time(hour, minute)
-            except (ValueError, IndexError):
+                initial_delivery_time = _parse_delivery_time(delivery_time_str)
+            except ValueError:
                 messagebox.showerror("Ошибка", "Неверный формат времени доставки. Используйте ЧЧ:ММ")
                 return
             
-            # Create bot instance
+            # Create bot instance (with a fresh error queue, so nothing is left over from a previous run)
+            self.error_queue = queue.Queue()
             self.bot_instance = DailyContentBot(
                 bot_token=bot_token,
-                disk_token=disk_token
+                disk_token=disk_token,
+                error_queue=self.error_queue
             )
             
             # Set delivery time from settings before starting
@@ -969,14 +1422,26 @@ class BotSettingsGUI:
     def _update_bot_status(self, running: bool):
         """Update bot status display."""
         self.bot_running = running
+        if running != self._bot_status_shown:
+            self._show_bot_status(running)
+        if not running:
+            # Stop error polling when bot stops
+            self._stop_error_polling()
+    
+    def _show_bot_status(self, running: bool):
+        """
+        Set the start button and status label for the given running state.
+        
+        No extra batching is needed: Tk defers widget redisplay and geometry updates to
+        idle time, so these configure calls are drawn together once the handler returns.
+        """
+        self._bot_status_shown = running
         if running:
             self.start_bot_button.config(text="Бот запущен", state='disabled')
             self.bot_status_label.config(text="Статус: Запущен", foreground="green")
         else:
             self.start_bot_button.config(text="Запустить бота", state='normal')
             self.bot_status_label.config(text="Статус: Остановлен", foreground="black")
-            # Stop error polling when bot stops
-            self._stop_error_polling()
     
     def _update_delivery_time(self):
         """Update delivery time in scheduler and save to settings."""
@@ -984,16 +1449,8 @@ class BotSettingsGUI:
         
         # Validate time format
         try:
-            from datetime import time as dt_time
-            parts = time_str.split(':')
-            if len(parts) != 2:
-                raise ValueError("Invalid format")
-            hour = int(parts[0])
-            minute = int(parts[1])
-            if hour < 0 or hour > 23 or minute < 0 or minute > 59:
-                raise ValueError("Invalid time range")
-            delivery_time = dt_time(hour, minute)
-        except (ValueError, IndexError):
+            delivery_time = _parse_delivery_time(time_str)
+        except ValueError:
             messagebox.showerror("Ошибка", "Неверный формат времени. Используйте ЧЧ:ММ (например, 09:00)")
             return
         
@@ -1001,9 +1458,8 @@ class BotSettingsGUI:
         if self.bot_running and self.bot_instance:
             try:
                 scheduler = self.bot_instance.get_scheduler()
-                # Pass the actual user_chat_map, or None to use existing one
-                user_map = getattr(self.bot_instance, 'user_chat_map', None)
-                scheduler.set_delivery_time(delivery_time, user_map)
+                # Pass the bot's user_chat_map (always set by DailyContentBot.__init__)
+                scheduler.set_delivery_time(delivery_time, self.bot_instance.user_chat_map)
                 messagebox.showinfo("Успех", f"Время доставки обновлено: {time_str}")
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Не удалось обновить время доставки: {str(e)}")
@@ -1012,71 +1468,110 @@ class BotSettingsGUI:
         
         # Always save to settings file
         try:
-            config = configparser.ConfigParser()
-            if self.settings_file.exists():
-                config.read(self.settings_file, encoding='utf-8')
+            config = self._get_settings_config() or self._new_settings_config()
+            
+            # The parser is cached, so this costs no file read; only write if the value changed
+            if config.get('scheduler', 'delivery_time', fallback=None) == time_str:
+                return
             
             if 'scheduler' not in config:
                 config.add_section('scheduler')
             
             config['scheduler']['delivery_time'] = time_str
             
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                config.write(f)
+            self._write_settings_config(config)
         except Exception as e:
             print(f"Warning: Could not save delivery time to settings: {str(e)}")
     
     def _start_error_polling(self):
         """Start polling scheduler for errors."""
-        if self.error_poll_running:
+        if self._error_after_id is not None:
+            return
+        
+        self._error_after_id = self.root.after(self.ERROR_POLL_INTERVAL_MS, self._poll_errors_tick)
+    
+    def _poll_errors_tick(self):
+        """Show newly reported delivery errors and schedule the next check (runs on the Tk thread)."""
+        self._error_after_id = None
+        if not self.bot_running:
             return
         
-        self.error_poll_running = True
+        try:
+            self._drain_error_queue()
+        except Exception as e:
+            print(f"Error polling: {str(e)}")
         
-        def poll_errors():
-            import time
-            while self.error_poll_running and self.bot_running:
-                try:
-                    if self.bot_instance:
-                        scheduler = self.bot_instance.get_scheduler()
-                        errors = scheduler.get_delivery_errors()
-                        
-                        # Update UI in main thread
-                        self.root.after(0, lambda: self._update_error_indicator(errors))
-                    
-                    # Poll every 15 seconds (between 10-20 as requested)
-                    time.sleep(15)
-                except Exception as e:
-                    print(f"Error polling: {str(e)}")
-                    time.sleep(15)
+        self._error_after_id = self.root.after(self.ERROR_POLL_INTERVAL_MS, self._poll_errors_tick)
+    
+    def _drain_error_queue(self) -> bool:
+        """
+        Move the errors the scheduler queued since the last check into current_errors.
+        
+        Only the Tk thread touches current_errors and the indicator; the bot's threads
+        just put into the queue. The indicator is updated once per drain.
+        
+        Returns:
+            True if there were new errors.
+        """
+        drained = []
+        try:
+            while True:
+                drained.append(self.error_queue.get_nowait())
+        except queue.Empty:
+            pass
         
-        self.error_poll_thread = threading.Thread(target=poll_errors, daemon=True)
-        self.error_poll_thread.start()
+        if not drained:
+            return False
+        
+        errors = self.current_errors + drained
+        self._error_users.update(err['username'] for err in drained)
+        
+        # Keep as many as the scheduler itself stores
+        limit = self.bot_instance.get_scheduler().MAX_STORED_ERRORS if self.bot_instance else len(errors)
+        if len(errors) > limit:
+            evicted, errors = errors[:-limit], errors[-limit:]
+            self._error_users.subtract(err['username'] for err in evicted)
+            self._error_users = +self._error_users  # drop users with no errors left
+        
+        self.current_errors = errors
+        self._show_error_count()
+        return True
     
     def _stop_error_polling(self):
         """Stop error polling."""
-        self.error_poll_running = False
-        self.current_errors = []
+        if self._error_after_id is not None:
+            self.root.after_cancel(self._error_after_id)
+            self._error_after_id = None
         self._update_error_indicator([])
     
     def _update_error_indicator(self, errors: List[Dict[str, Any]]):
-        """Update error indicator display."""
+        """Replace the shown errors and update the indicator."""
         self.current_errors = errors
-        
-        if not errors:
-            self.error_indicator_label.config(text="")
+        self._error_users = Counter(err['username'] for err in errors)
+        self._show_error_count()
+    
+    def _show_error_count(self):
+        """Show the number of users with delivery errors on the indicator."""
+        # Unique usernames with errors, kept up to date by _update_error_indicator and _drain_error_queue
+        error_count = len(self._error_users)
+        if not error_count:
+            self._set_error_indicator("")
             return
         
-        # Get unique usernames with errors
-        unique_users = set(err['username'] for err in errors)
-        error_count = len(unique_users)
-        
         if error_count == 1:
             text = f"⚠️ Ошибка доставки для 1 пользователя (нажмите для повтора)"
         else:
             text = f"⚠️ Ошибки доставки для {error_count} пользователей (нажмите для повтора)"
         
-        self.error_indicator_label.config(text=text)
+        self._set_error_indicator(text)
+    
+    def _set_error_indicator(self, text: str, foreground: str = "red"):
+        """Show text on the error indicator, skipping the Tk call (and redraw) if it is already shown."""
+        if self._error_indicator_shown == (text, foreground):
+            return
+        
+        self.error_indicator_label.config(text=text, foreground=foreground)
+        self._error_indicator_shown = (text, foreground)
     
     def _on_error_indicator_click(self, event):
         """Handle click on error indicator to retry delivery."""
@@ -1088,7 +1583,7 @@ class BotSettingsGUI:
             return
         
         # Get unique usernames with errors
-        usernames = list(set(err['username'] for err in self.current_errors))
+        usernames = list(self._error_users)
         
         # Confirm retry
         if not messagebox.askyesno(
@@ -1098,9 +1593,9 @@ class BotSettingsGUI:
         ):
             return
         
-        # Show progress
-        self.error_indicator_label.config(text="⏳ Выполняется доставка...", foreground="blue")
-        self.root.update()
+        # Show progress (painted as soon as this handler returns to the event loop,
+        # since the retry itself runs on a worker thread)
+        self._set_error_indicator("⏳ Выполняется доставка...", foreground="blue")
         
         def retry_delivery():
             try:
@@ -1115,16 +1610,15 @@ class BotSettingsGUI:
                     if failed == 0:
                         # All successful, clear errors
                         scheduler.clear_delivery_errors()
-                        self.current_errors = []
                         self._update_error_indicator([])
                         messagebox.showinfo(
                             "Успех",
                             f"Доставка успешно выполнена для всех {successful} пользователя(ей)"
                         )
                     else:
-                        # Some failed, update indicator
-                        new_errors = scheduler.get_delivery_errors()
-                        self._update_error_indicator(new_errors)
+                        # Some failed; the failures were queued by the scheduler
+                        if not self._drain_error_queue():
+                            self._update_error_indicator(self.current_errors)
                         messagebox.showwarning(
                             "Частичный успех",
                             f"Успешно: {successful}, Ошибок: {failed}\n"
@@ -1135,16 +1629,14 @@ class BotSettingsGUI:
             except Exception as e:
                 def show_error():
                     messagebox.showerror("Ошибка", f"Не удалось выполнить доставку: {str(e)}")
-                    # Refresh error list
-                    if self.bot_instance:
-                        scheduler = self.bot_instance.get_scheduler()
-                        errors = scheduler.get_delivery_errors()
-                        self._update_error_indicator(errors)
+                    # Refresh error list, restoring the indicator text replaced by the progress message
+                    if not self._drain_error_queue():
+                        self._update_error_indicator(self.current_errors)
                 
                 self.root.after(0, show_error)
         
-        # Run retry in separate thread to avoid blocking UI
-        threading.Thread(target=retry_delivery, daemon=True).start()
+        # Run retry in a background thread to avoid blocking UI
+        self._executor.submit(retry_delivery)
     
     def _stop_bot(self):
         """Stop the bot."""
@@ -1180,12 +1672,14 @@ class BotSettingsGUI:
                 # Stop error polling
                 self._stop_error_polling()
                 self._stop_bot()
+                self._executor.shutdown(wait=False, cancel_futures=True)
                 self.root.destroy()
         else:
             # Stop file polling
             self._stop_file_polling()
             # Stop error polling if it's running
             self._stop_error_polling()
+            self._executor.shutdown(wait=False, cancel_futures=True)
             self.root.destroy()
 
 